@@ -0,0 +1,477 @@
+"""
+Frame pipeline benchmarks.
+
+    python -m branch_game.bench --save baseline.json
+    python -m branch_game.bench --compare baseline.json --threshold 0.25
+    python -m branch_game.bench --limiters
+    python -m branch_game.bench --startup
+    python -m branch_game.bench --startup --save startup.json
+    python -m branch_game.bench --startup --compare startup.json --threshold 0.25
+    python -m branch_game.bench --allocations
+
+Exits with status 1 when any case is slower than its baseline by more than `threshold`.
+`--limiters` instead compares the CPU cost and wake-up accuracy of each frame limiter strategy.
+`--startup` measures the game's import time with `python -X importtime` instead of the frame
+cases, against a baseline like them or `STARTUP_BUDGET_MS` without one, and also fails when
+it imports a module from `STARTUP_DEFERRED_MODULES` eagerly.
+`--allocations` exits with status 1 when an unchanged frame allocates more than its budget.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections.abc import Callable
+from dataclasses import dataclass
+from functools import partial
+
+from branch_game.data_types import Context, FPSCounter, Node, Rune, RuneData, RuneRarity
+from branch_game.ezterm import (
+    BACKGROUND_COLOR,
+    RGBA,
+    RichText,
+    blit_at,
+    fill_screen_background,
+    overlay_rect,
+    prerender,
+    print_at,
+)
+from branch_game.fps_limiter import FrameTrace, LimiterStrategy, create_fps_limiter
+from branch_game.headless import MemorySink, create_headless_context, create_headless_terminal
+from branch_game.main import ProgramStatus, tick
+from branch_game.node_store import node_store_from_tree
+from branch_game.save_format import load_game, load_into_context, save_game
+from branch_game.screen_buffer import (
+    AnyScreen,
+    ArrayScreen,
+    CompositeScreen,
+    Screen,
+    ScreenCell,
+    buffer_diff,
+    flush_diffs,
+)
+from branch_game.tree_view import generate_tree_view
+
+TERMINAL_SIZES = [(80, 24), (160, 48), (300, 90), (400, 120)]
+TREE_SIZES = [1, 100, 10_000, 100_000]
+
+MIN_ROUNDS = 5
+MIN_SECONDS = 0.2
+
+# Translucent panel blended over the composite benchmark frame
+PANEL_COLOR = RGBA(0.05, 0.05, 0.1, 0.8)
+
+LIMITER_FPS = 144
+LIMITER_FRAMES = 432
+
+STARTUP_MODULE = "branch_game.main"
+# Fresh interpreters the median import time is taken over
+STARTUP_RUNS = 5
+# Imported only once the asyncio loop or a save file needs them
+STARTUP_DEFERRED_MODULES = ("asyncio", "branch_game.save_format")
+# Checked when no baseline is given, loose enough for slow machines; a baseline
+# from the same machine catches smaller regressions
+STARTUP_BUDGET_MS = 400
+
+# Frames drawn before measuring fill the style cache and dirty spans
+ALLOCATION_WARMUP_FRAMES = 10
+ALLOCATION_FRAMES = 200
+# Peak bytes a steady frame may allocate per cell. Copying the frame (what `buffer_diff`
+# did with `deepcopy`) costs at least 8 per cell on `Screen`; the NumPy backends
+# compare whole planes, so their temporaries grow with the screen.
+ALLOCATION_BUDGET_PER_CELL = {"Screen": 1.0, "ArrayScreen": 24.0, "CompositeScreen": 48.0}
+
+
+@dataclass
+class BenchCase:
+    name: str
+    run: Callable[[], object]
+    # Untimed, runs before every round
+    setup: Callable[[], object] | None = None
+
+
+@dataclass
+class BenchGroup:
+    """Cases sharing state (screens, trees, save files) that `build` only creates when needed."""
+
+    names: list[str]
+    build: Callable[[], list[BenchCase]]
+
+
+def measure(case: BenchCase) -> int:
+    """Median nanoseconds per round."""
+    samples: list[int] = []
+    deadline = time.perf_counter() + MIN_SECONDS
+
+    while len(samples) < MIN_ROUNDS or time.perf_counter() < deadline:
+        if case.setup is not None:
+            _ = case.setup()
+        start = time.perf_counter_ns()
+        _ = case.run()
+        samples.append(time.perf_counter_ns() - start)
+
+    return int(statistics.median(samples))
+
+
+def build_tree(node_count: int) -> Node:
+    """Breadth-first binary tree, the widest shape the COMMON branch limit allows."""
+    root = Node(Rune(RuneRarity.COMMON, RuneData(5, 1, "X Pik")))
+    nodes = [root]
+
+    for index in range(1, node_count):
+        parent = nodes[(index - 1) // 2]
+        rune = Rune(RuneRarity.COMMON, RuneData(index % 7, 1 + index % 3, "Vek"))
+        child = Node(rune, parent=parent)
+        parent.children.append(child)
+        nodes.append(child)
+
+    return root
+
+
+SCREEN_CASES = (
+    "print_at",
+    "fill_screen_background",
+    "buffer_diff",
+    "buffer_diff_sparse",
+    "flush_diffs",
+    "frame_draw_diff",
+    "composite_frame_draw_diff",
+)
+
+
+def screen_cases(width: int, height: int) -> BenchGroup:
+    size = f"{width}x{height}"
+    return BenchGroup(
+        [f"{case}/{size}" for case in SCREEN_CASES], partial(_build_screen_cases, width, height)
+    )
+
+
+def _build_screen_cases(width: int, height: int) -> list[BenchCase]:
+    terminal = create_headless_terminal()
+    screen = Screen(width, height)
+    size = f"{width}x{height}"
+    line = ("X Pik (1/2)  (+5 points +2 mult) " * (width // 30 + 1))[:width]
+    text = RichText(line, RGBA(0.2, 0.8, 0.4, 1.0))
+
+    def draw_frame() -> None:
+        for y in range(height):
+            print_at(terminal, screen, 0, y, text)
+
+    def draw_and_diff() -> None:
+        draw_frame()
+        _ = buffer_diff(screen)
+
+    frame_diffs: list[list[tuple[int, int, ScreenCell]]] = []
+
+    def capture_diffs() -> None:
+        frame_diffs.clear()
+        draw_frame()
+        frame_diffs.append(buffer_diff(screen))
+        # Next frame repaints everything against an empty screen
+        _ = buffer_diff(screen)
+
+    counter_text = RichText(" 144.0 FPS", RGBA(1.0, 1.0, 1.0, 1.0), bold=True)
+
+    def draw_counter() -> None:
+        # A mostly static screen: only the FPS counter is drawn
+        print_at(terminal, screen, width - 11, 0, counter_text)
+
+    sink = MemorySink()
+    composite = CompositeScreen(width, height, terminal)
+
+    def composite_draw_diff() -> None:
+        for y in range(height):
+            print_at(terminal, composite, 0, y, text)
+        overlay_rect(composite, width // 4, height // 4, width // 2, height // 2, PANEL_COLOR)
+        _ = buffer_diff(composite)
+
+    return [
+        BenchCase(f"print_at/{size}", draw_frame),
+        BenchCase(
+            f"fill_screen_background/{size}",
+            partial(fill_screen_background, terminal, screen, BACKGROUND_COLOR),
+        ),
+        BenchCase(f"buffer_diff/{size}", lambda: buffer_diff(screen), setup=draw_frame),
+        BenchCase(f"buffer_diff_sparse/{size}", lambda: buffer_diff(screen), setup=draw_counter),
+        BenchCase(
+            f"flush_diffs/{size}",
+            lambda: flush_diffs(terminal, frame_diffs[0], sink),
+            setup=capture_diffs,
+        ),
+        BenchCase(f"frame_draw_diff/{size}", draw_and_diff),
+        BenchCase(f"composite_frame_draw_diff/{size}", composite_draw_diff),
+    ]
+
+
+def tree_cases(node_count: int) -> BenchGroup:
+    name = f"generate_tree_view/{node_count}"
+
+    def build() -> list[BenchCase]:
+        ctx: Context = create_headless_context()
+        ctx.node_tree = build_tree(node_count)
+        return [BenchCase(name, lambda: generate_tree_view(ctx))]
+
+    return BenchGroup([name], build)
+
+
+def save_cases(node_count: int, directory: str) -> BenchGroup:
+    load_name = f"load_game/{node_count}"
+    view_name = f"generate_tree_view_loaded/{node_count}"
+
+    def build() -> list[BenchCase]:
+        path = os.path.join(directory, f"tree_{node_count}.bgsv")
+        store = node_store_from_tree(build_tree(node_count))
+        save_game(path, store, [])
+
+        ctx: Context = create_headless_context()
+        load_into_context(ctx, path)
+        return [
+            BenchCase(load_name, lambda: load_game(path)),
+            BenchCase(view_name, lambda: generate_tree_view(ctx)),
+        ]
+
+    return BenchGroup([load_name, view_name], build)
+
+
+def tick_cases(width: int, height: int, node_count: int) -> BenchGroup:
+    size = f"{width}x{height}/{node_count}"
+    return BenchGroup(
+        [f"tick/{size}", f"tick_idle/{size}"],
+        partial(_build_tick_cases, width, height, node_count),
+    )
+
+
+def _build_tick_cases(width: int, height: int, node_count: int) -> list[BenchCase]:
+    ctx = create_headless_context(width, height)
+    ctx.node_tree = build_tree(node_count)
+    ctx.tree_version += 1
+    draw = partial(print_at, ctx.terminal, ctx.screen)
+    fps_counter = FPSCounter()
+
+    def render_frame() -> ProgramStatus:
+        # Idle ticks skip rendering, this measures a full frame
+        ctx.dirty = True
+        return tick(ctx, 1.0 / 144.0, draw, fps_counter)
+
+    return [
+        BenchCase(f"tick/{width}x{height}/{node_count}", render_frame),
+        BenchCase(
+            f"tick_idle/{width}x{height}/{node_count}",
+            lambda: tick(ctx, 1.0 / 144.0, draw, fps_counter),
+        ),
+    ]
+
+
+def all_cases(directory: str) -> list[BenchGroup]:
+    """`directory` holds the save files the load cases write and read."""
+    groups: list[BenchGroup] = []
+    for width, height in TERMINAL_SIZES:
+        groups.append(screen_cases(width, height))
+    for node_count in TREE_SIZES:
+        groups.append(tree_cases(node_count))
+        groups.append(save_cases(node_count, directory))
+    for width, height in (TERMINAL_SIZES[0], TERMINAL_SIZES[-1]):
+        for node_count in TREE_SIZES:
+            groups.append(tick_cases(width, height, node_count))
+    return groups
+
+
+def compare_limiters(fps: float = LIMITER_FPS, frames: int = LIMITER_FRAMES) -> list[str]:
+    """One line per strategy: share of a core used while waiting and wake-up error percentiles."""
+    lines: list[str] = []
+    for strategy in LimiterStrategy:
+        trace = FrameTrace(capacity=frames)
+        limiter = create_fps_limiter(fps, trace=trace, strategy=strategy)
+
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        for _ in range(frames):
+            _ = limiter.wait_for_next_frame()
+        cpu_share = (time.process_time() - cpu_start) / (time.perf_counter() - wall_start)
+
+        errors = sorted(abs(error) for error in trace.wake_error)
+        p50, p99 = errors[frames // 2], errors[int(frames * 0.99)]
+        lines.append(
+            f"{strategy.name.lower():<10} cpu {cpu_share:>6.1%}"
+            f"   wake error p50 {p50 * 1e3:.3f} ms  p99 {p99 * 1e3:.3f} ms"
+            f"   resyncs {sum(trace.resynced)}"
+        )
+    return lines
+
+
+def import_times(module: str) -> dict[str, int]:
+    """Cumulative import time in microseconds of every module `module` imports, itself included."""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times: dict[str, int] = {}
+    # Lines look like "import time: <self us> | <cumulative us> | <indented module name>"
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line.removeprefix("import time:").split("|")
+        if cumulative.strip().isdigit():
+            times[name.strip()] = int(cumulative)
+    return times
+
+
+def measure_startup(runs: int = STARTUP_RUNS) -> tuple[dict[str, int], list[str]]:
+    """
+    Median nanoseconds `STARTUP_MODULE` takes to import from a cold interpreter,
+    keyed like the bench cases, and failures for modules it should not import yet.
+    """
+    samples = [import_times(STARTUP_MODULE) for _ in range(runs)]
+    startup_us = statistics.median(times[STARTUP_MODULE] for times in samples)
+
+    failures = [
+        f"import {STARTUP_MODULE}: imports {module} eagerly"
+        for module in STARTUP_DEFERRED_MODULES
+        if module in samples[0]
+    ]
+    return {f"import/{STARTUP_MODULE}": int(startup_us * 1e3)}, failures
+
+
+def check_allocations(
+    width: int = 300, height: int = 90, frames: int = ALLOCATION_FRAMES
+) -> tuple[list[str], list[str]]:
+    """
+    Report lines and failures for the peak memory one unchanged frame allocates,
+    per screen backend. Rows are prerendered and blitted, like the game's tree rows.
+    """
+    terminal = create_headless_terminal()
+    line = ("X Pik (1/2)  (+5 points +2 mult) " * (width // 30 + 1))[:width]
+    text = RichText(line, RGBA(0.2, 0.8, 0.4, 1.0))
+
+    lines: list[str] = []
+    failures: list[str] = []
+    screens: list[AnyScreen] = [
+        Screen(width, height),
+        ArrayScreen(width, height),
+        CompositeScreen(width, height, terminal),
+    ]
+    for screen in screens:
+        row = prerender(terminal, screen, text)
+
+        def draw_frame() -> None:
+            for y in range(height):
+                blit_at(screen, 0, y, row)
+            _ = buffer_diff(screen)
+
+        peak_bytes = 0
+        tracemalloc.start()
+        try:
+            for _ in range(ALLOCATION_WARMUP_FRAMES):
+                draw_frame()
+            for _ in range(frames):
+                before, _ = tracemalloc.get_traced_memory()
+                tracemalloc.reset_peak()
+                draw_frame()
+                _, peak = tracemalloc.get_traced_memory()
+                peak_bytes = max(peak_bytes, peak - before)
+        finally:
+            tracemalloc.stop()
+
+        name = type(screen).__name__
+        budget = ALLOCATION_BUDGET_PER_CELL[name] * width * height
+        lines.append(
+            f"{name:<16} peak {peak_bytes:>9} bytes per frame"
+            f" ({peak_bytes / (width * height):.1f} per cell, budget {budget:.0f})"
+        )
+        if peak_bytes > budget:
+            failures.append(f"{name}: a frame allocates {peak_bytes} bytes, over {budget:.0f}")
+    return lines, failures
+
+
+def find_regressions(
+    results: dict[str, int], baseline: dict[str, int], threshold: float
+) -> list[str]:
+    regressions: list[str] = []
+    for name, nanoseconds in results.items():
+        baseline_ns = baseline.get(name)
+        if baseline_ns and nanoseconds > baseline_ns * (1.0 + threshold):
+            regressions.append(
+                f"{name}: {nanoseconds / 1e3:.1f} us vs {baseline_ns / 1e3:.1f} us baseline"
+            )
+    return regressions
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m branch_game.bench")
+    _ = parser.add_argument("--filter", default="", help="only run cases containing this")
+    _ = parser.add_argument("--save", metavar="PATH", help="write results as a baseline")
+    _ = parser.add_argument("--compare", metavar="PATH", help="baseline to check against")
+    _ = parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown")
+    _ = parser.add_argument(
+        "--limiters", action="store_true", help="compare frame limiter strategies instead"
+    )
+    _ = parser.add_argument(
+        "--startup", action="store_true", help="measure the game's import time instead"
+    )
+    _ = parser.add_argument(
+        "--allocations",
+        action="store_true",
+        help="check the peak memory unchanged frames allocate instead",
+    )
+    args = parser.parse_args(argv)
+
+    if args.limiters:
+        for line in compare_limiters():
+            print(line)
+        return 0
+
+    if args.allocations:
+        lines, failures = check_allocations()
+        for line in lines:
+            print(line)
+        for failure in failures:
+            print(f"REGRESSION {failure}", file=sys.stderr)
+        return 1 if failures else 0
+
+    results: dict[str, int] = {}
+    failures: list[str] = []
+    if args.startup:
+        results, failures = measure_startup()
+        for name, nanoseconds in results.items():
+            print(f"{name:<40} {nanoseconds / 1e3:>12.1f} us")
+    else:
+        with tempfile.TemporaryDirectory() as directory:
+            for group in all_cases(directory):
+                # Trees and save files are only built for groups the filter keeps
+                if not any(args.filter in name for name in group.names):
+                    continue
+                for case in group.build():
+                    if args.filter not in case.name:
+                        continue
+                    results[case.name] = measure(case)
+                    print(f"{case.name:<40} {results[case.name] / 1e3:>12.1f} us")
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2, sort_keys=True)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline: dict[str, int] = json.load(file)
+        failures.extend(find_regressions(results, baseline, args.threshold))
+    elif args.startup:
+        failures.extend(
+            f"{name}: {nanoseconds / 1e6:.1f} ms, over the {STARTUP_BUDGET_MS} ms budget"
+            for name, nanoseconds in results.items()
+            if nanoseconds > STARTUP_BUDGET_MS * 1e6
+        )
+
+    for failure in failures:
+        print(f"REGRESSION {failure}", file=sys.stderr)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
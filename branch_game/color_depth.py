@@ -0,0 +1,130 @@
+"""
+Color output modes for terminals without 24-bit color.
+
+Colors are snapped to the nearest palette entry with a lookup table indexed by
+the top 5 bits of each channel, built once per mode. Snapped colors stay packed
+0xRRGGBB, so whole style planes are mapped with one fancy index and cells whose
+colors land on the same palette entry no longer count as changed.
+"""
+
+from enum import IntEnum
+from functools import cache
+
+import numpy as np
+from blessed import Terminal
+from numpy.typing import NDArray
+
+_LUT_BITS = 5
+_LUT_SHIFT = 8 - _LUT_BITS
+_LUT_MASK = (1 << _LUT_BITS) - 1
+
+# xterm's defaults, the actual first 16 colors depend on the terminal's theme
+_SYSTEM_COLORS = [
+    (0, 0, 0), (205, 0, 0), (0, 205, 0), (205, 205, 0),
+    (0, 0, 238), (205, 0, 205), (0, 205, 205), (229, 229, 229),
+    (127, 127, 127), (255, 0, 0), (0, 255, 0), (255, 255, 0),
+    (92, 92, 255), (255, 0, 255), (0, 255, 255), (255, 255, 255),
+]  # fmt: skip
+_CUBE_LEVELS = (0, 95, 135, 175, 215, 255)
+
+
+class ColorDepth(IntEnum):
+    """Output mode, valued by its number of colors."""
+
+    TRUECOLOR = 1 << 24
+    COLORS_256 = 256
+    COLORS_16 = 16
+    COLORS_8 = 8
+
+
+def color_depth_for(term: Terminal) -> ColorDepth:
+    colors = term.number_of_colors
+    if colors >= ColorDepth.TRUECOLOR:
+        return ColorDepth.TRUECOLOR
+    if colors >= ColorDepth.COLORS_256:
+        return ColorDepth.COLORS_256
+    if colors >= ColorDepth.COLORS_16:
+        return ColorDepth.COLORS_16
+    return ColorDepth.COLORS_8
+
+
+def _palette(depth: ColorDepth) -> list[tuple[int, int, int]]:
+    """Palette colors, in terminal color index order from `_palette_offset`."""
+    if depth != ColorDepth.COLORS_256:
+        return _SYSTEM_COLORS[:depth]
+
+    # The themeable system colors are left out, so the same RGB looks the same everywhere
+    cube = [(r, g, b) for r in _CUBE_LEVELS for g in _CUBE_LEVELS for b in _CUBE_LEVELS]
+    grays = [(level, level, level) for level in range(8, 248, 10)]
+    return cube + grays
+
+
+def _palette_offset(depth: ColorDepth) -> int:
+    return 16 if depth == ColorDepth.COLORS_256 else 0
+
+
+@cache
+def palette_lut(depth: ColorDepth) -> NDArray[np.uint32]:
+    """Nearest palette color, packed 0xRRGGBB, for every 5 bit per channel color."""
+    palette = np.array(_palette(depth), dtype=np.float32)
+    levels = (np.arange(1 << _LUT_BITS, dtype=np.float32) + 0.5) * (1 << _LUT_SHIFT)
+    r, g, b = np.meshgrid(levels, levels, levels, indexing="ij")
+    colors = np.stack([r.ravel(), g.ravel(), b.ravel()], axis=1)
+
+    # |c - p|^2 without materializing every difference vector
+    distances = (
+        (colors**2).sum(axis=1)[:, None]
+        - 2.0 * colors @ palette.T
+        + (palette**2).sum(axis=1)[None, :]
+    )
+    nearest = palette[distances.argmin(axis=1)].astype(np.uint32)
+    return (nearest[:, 0] << 16) | (nearest[:, 1] << 8) | nearest[:, 2]
+
+
+@cache
+def palette_indices(depth: ColorDepth) -> dict[int, int]:
+    """Terminal color index of each packed palette color."""
+    offset = _palette_offset(depth)
+    return {
+        (r << 16) | (g << 8) | b: offset + index
+        for index, (r, g, b) in enumerate(_palette(depth))
+    }
+
+
+def snap_to_palette(depth: ColorDepth, packed: NDArray[np.uint32]) -> NDArray[np.uint32]:
+    """Maps packed 0xRRGGBB colors to their nearest palette color in one table lookup."""
+    if depth == ColorDepth.TRUECOLOR:
+        return packed
+
+    lut_index = (
+        ((packed >> (16 + _LUT_SHIFT)) & _LUT_MASK) << (2 * _LUT_BITS)
+        | ((packed >> (8 + _LUT_SHIFT)) & _LUT_MASK) << _LUT_BITS
+        | ((packed >> _LUT_SHIFT) & _LUT_MASK)
+    )
+    return palette_lut(depth)[lut_index]
+
+
+def snap_rgb(depth: ColorDepth, rgb: tuple[int, int, int]) -> tuple[int, int, int]:
+    """`snap_to_palette` for a single color."""
+    if depth == ColorDepth.TRUECOLOR:
+        return rgb
+
+    r, g, b = rgb
+    lut_index = (r >> _LUT_SHIFT) << (2 * _LUT_BITS) | (g >> _LUT_SHIFT) << _LUT_BITS
+    packed = int(palette_lut(depth)[lut_index | (b >> _LUT_SHIFT)])
+    return packed >> 16, (packed >> 8) & 0xFF, packed & 0xFF
+
+
+def palette_style(
+    term: Terminal,
+    depth: ColorDepth,
+    fg_rgb: tuple[int, int, int],
+    bg_rgb: tuple[int, int, int],
+    bold: bool,
+) -> str:
+    """Style escape for colors already snapped to `depth`'s palette."""
+    indices = palette_indices(depth)
+    fg_index = indices[(fg_rgb[0] << 16) | (fg_rgb[1] << 8) | fg_rgb[2]]
+    bg_index = indices[(bg_rgb[0] << 16) | (bg_rgb[1] << 8) | bg_rgb[2]]
+    maybe_bold_str: str = term.bold if bold else ""
+    return term.normal + maybe_bold_str + term.color(fg_index) + term.on_color(bg_index)
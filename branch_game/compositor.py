@@ -0,0 +1,82 @@
+"""
+Alpha blending for `CompositeScreen`.
+
+Every draw is a layer blended over the buffer's float RGB planes in bulk:
+a cell's background is mixed by its background alpha first, then its
+foreground is mixed over that result by the foreground alpha.
+"""
+
+import numpy as np
+from numpy.typing import NDArray
+
+from branch_game.screen_buffer import (
+    BLANK_GLYPH,
+    CompositeScreenBuffer,
+    mark_all_dirty,
+    mark_dirty,
+)
+
+# One cell of a layer; a `bg_alpha` of 0 keeps whatever background is underneath
+CELL_DTYPE = np.dtype(
+    [
+        ("glyph", np.uint32),
+        ("fg", np.float32, 3),
+        ("fg_alpha", np.float32),
+        ("bg", np.float32, 3),
+        ("bg_alpha", np.float32),
+        ("bold", np.bool_),
+    ]
+)
+
+
+def blend_cells(buffer: CompositeScreenBuffer, x: int, y: int, cells: NDArray[np.void]) -> None:
+    """Blends a row of `CELL_DTYPE` cells over the buffer at (x, y)."""
+    if not (0 <= y < buffer.height):
+        return  # Y out of bounds
+
+    start = max(x, 0)
+    end = min(x + len(cells), buffer.width)
+    if start >= end:
+        return
+
+    visible = cells[start - x : end - x]
+    bg = buffer.bg[y, start:end]
+    bg_alpha = visible["bg_alpha"]
+    # Most text has no background of its own, skip blending it in
+    if bg_alpha.any():
+        bg += (visible["bg"] - bg) * bg_alpha[:, None]
+    buffer.fg[y, start:end] = bg + (visible["fg"] - bg) * visible["fg_alpha"][:, None]
+    buffer.glyphs[y, start:end] = visible["glyph"]
+    buffer.bold[y, start:end] = visible["bold"]
+    mark_dirty(buffer, y, start, end)
+
+
+def blend_rect(
+    buffer: CompositeScreenBuffer,
+    x: int,
+    y: int,
+    width: int,
+    height: int,
+    rgb: tuple[float, float, float],
+    alpha: float,
+) -> None:
+    """Tints a rectangle towards `rgb`, glyphs and all, like a translucent panel."""
+    x_start, x_end = max(x, 0), min(x + width, buffer.width)
+    y_start, y_end = max(y, 0), min(y + height, buffer.height)
+    if x_start >= x_end or y_start >= y_end:
+        return
+
+    color = np.array(rgb, dtype=np.float32)
+    for plane in (buffer.fg, buffer.bg):
+        region = plane[y_start:y_end, x_start:x_end]
+        region += (color - region) * np.float32(alpha)
+    for row in range(y_start, y_end):
+        mark_dirty(buffer, row, x_start, x_end)
+
+
+def fill_background(buffer: CompositeScreenBuffer, rgb: tuple[float, float, float]) -> None:
+    buffer.glyphs.fill(BLANK_GLYPH)
+    buffer.bold.fill(False)
+    buffer.fg[:] = rgb
+    buffer.bg[:] = rgb
+    mark_all_dirty(buffer)
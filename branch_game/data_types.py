@@ -1,12 +1,29 @@
 from __future__ import annotations
 
 from abc import ABC
+from array import array
 from dataclasses import dataclass, field
-from enum import Enum, auto
+from enum import Enum, IntEnum, auto
+from typing import TYPE_CHECKING, Protocol
 
 from blessed import Terminal
+from blessed.keyboard import Keystroke
 
-from branch_game.screen_buffer import Screen
+from branch_game.screen_buffer import AnyScreen, CellRun, OutputSink
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor, Future
+
+    from branch_game.draft_evaluator import Placement
+    from branch_game.scoring import TreeScores
+
+
+class KeySource(Protocol):
+    """Where `tick` reads keys from, a blessed `Terminal` by default."""
+
+    def inkey(self, timeout: float | None = None) -> Keystroke: ...
+
+    def kbhit(self, timeout: float | None = None) -> bool: ...
 
 
 class GameState(ABC):
@@ -53,6 +70,8 @@ class Node:
     rune: Rune
     children: list[Node] = field(default_factory=list)  # type: ignore[reportUnknownVariableType]
     parent: Node | None = None
+    # Bumped whenever `children` changes
+    version: int = 0
 
 
 @dataclass
@@ -61,18 +80,110 @@ class TreeViewItem:
     depth: int
 
 
+@dataclass
+class TreeView:
+    """Flattened depth-first view of the node tree, reused across frames."""
+
+    items: list[TreeViewItem] = field(
+        default_factory=list  # type: ignore[reportUnknownVariableType]
+    )
+    # `Context.tree_version` these items were built from, -1 forces a rebuild
+    version: int = -1
+
+
+class ProfilerStage(IntEnum):
+    INPUT = 0
+    TREE_VIEW = auto()
+    FORMAT = auto()
+    DIFF = auto()
+    FLUSH = auto()
+
+
+@dataclass
+class FrameProfiler:
+    enabled: bool = False
+    # Frames kept for the rolling percentiles
+    window: int = 240
+    frame_count: int = 0
+    last_mark_ns: int = 0
+    # Per-frame ring buffers; `stage_ns` is indexed by `ProfilerStage`
+    stage_ns: list[array[int]] = field(init=False)
+    bytes_flushed: array[int] = field(init=False)
+    cells_diffed: array[int] = field(init=False)
+
+    def __post_init__(self):
+        self.stage_ns = [array("q", bytes(8 * self.window)) for _ in ProfilerStage]
+        self.bytes_flushed = array("q", bytes(8 * self.window))
+        self.cells_diffed = array("q", bytes(8 * self.window))
+
+
+class RowMode(Enum):
+    NORMAL = auto()
+    # Without the subtree totals, those change with any descendant
+    SELECTED = auto()
+
+
+@dataclass
+class RowCache:
+    """Prerendered tree rows keyed by (node identity, node version, mode)."""
+
+    rows: dict[tuple[int, int, int, RowMode], tuple[object, CellRun]] = field(
+        default_factory=dict  # type: ignore[reportUnknownVariableType]
+    )
+    capacity: int = 4096
+    # `StyleCache.evictions` the rows were rendered at, evictions can recycle their style IDs
+    evictions: int = 0
+
+
+@dataclass
+class DraftRanker:
+    # Created on the first draft, `concurrent.futures` alone is slow to import
+    background: Executor | None = None
+    pool: Executor | None = None
+    # Placements of the current draft, ranked at `version` of `Context.tree_version`
+    ranking: Future[list[Placement]] | None = None
+    version: int = -1
+
+
+@dataclass
+class ResizeState:
+    # Monotonic time of the latest resize not applied yet
+    last_event: float | None = None
+    # No SIGWINCH (Windows), compare the terminal size every frame instead
+    poll: bool = False
+    # Read end of the pipe signals are written to, wakes an idle wait for keys
+    wakeup_fd: int | None = None
+
+
 @dataclass
 class Context:
     terminal: Terminal
-    screen: Screen
+    screen: AnyScreen
     state: GameState
     node_tree: Node
     owned_runes: list[Rune] = field(default_factory=list)  # type: ignore[reportUnknownVariableType]
     tick_count: int = 0
     debug_line: str = ""
+    # Bumped on every structural change to `node_tree`
+    tree_version: int = 0
+    tree_view: TreeView = field(default_factory=TreeView)
+    tree_scores: TreeScores | None = None
+    # First tree view row shown at the top of the screen
+    viewport_top: int = 0
+    # Fall back to `terminal` for keys and to stdout for output
+    keys: KeySource | None = None
+    output: OutputSink | None = None
+    profiler: FrameProfiler = field(default_factory=FrameProfiler)
+    # Something on screen changed since the last rendered frame
+    dirty: bool = True
+    resize: ResizeState = field(default_factory=ResizeState)
+    row_cache: RowCache = field(default_factory=RowCache)
+    # Ranks draft placements off the UI thread, `None` (headless runs) ranks nothing
+    draft_ranker: DraftRanker | None = None
 
 
 @dataclass
 class FPSCounter:
     ema: float = 0.0
     alpha: float = 0.08
+
@@ -0,0 +1,226 @@
+import multiprocessing
+from concurrent.futures import (
+    BrokenExecutor,
+    Executor,
+    Future,
+    ProcessPoolExecutor,
+    ThreadPoolExecutor,
+)
+from dataclasses import dataclass, replace
+
+import numpy as np
+from numpy.typing import NDArray
+
+from branch_game.data import RUNE_RARITY_MAX_BRANCH_COUNT
+from branch_game.data_types import Context, DraftRanker, Rune, TreeViewItem
+from branch_game.node_store import copy_tree_view, view_depths, view_rarities
+from branch_game.scoring import NO_PARENT, TreeScores, path_multipliers, tree_score
+from branch_game.tree_view import get_tree_scores, get_tree_view
+
+# Below this many candidate placements, pickling to worker processes costs more than it saves
+PROCESS_POOL_MIN_PLACEMENTS = 1_000_000
+PLACEMENTS_PER_CHUNK = 250_000
+# Placements kept per draft, the game only shows the best one
+DRAFT_RANKING_LIMIT = 10
+
+
+@dataclass
+class Placement:
+    rune_index: int
+    parent_view_index: int
+    # Whole-tree score after drafting the rune under the parent
+    score: float
+
+
+@dataclass
+class PlacementBatch:
+    """Every legal parent for a draft and the inventory's leaf scores, as flat arrays."""
+
+    base_score: float
+    parent_view_indices: NDArray[np.int64]
+    # Worth of one point placed under each parent
+    parent_multipliers: NDArray[np.float64]
+    # Score each owned rune adds as a leaf, before its parent's multipliers
+    rune_leaf_scores: NDArray[np.float64]
+
+
+def collect_placements(
+    items: list[TreeViewItem], scores: TreeScores, owned_runes: list[Rune]
+) -> PlacementBatch:
+    count = len(items)
+    depths = view_depths(items)
+    rarities = view_rarities(items)
+
+    max_branches_by_rarity = np.zeros(rarities.max(initial=0) + 1, dtype=np.int64)
+    for rarity, max_branches in RUNE_RARITY_MAX_BRANCH_COUNT.items():
+        if rarity.value < len(max_branches_by_rarity):
+            max_branches_by_rarity[rarity.value] = max_branches
+
+    has_parent = scores.parents != NO_PARENT
+    child_counts = np.bincount(scores.parents[has_parent], minlength=count)
+    legal_parents = np.flatnonzero(child_counts < max_branches_by_rarity[rarities])
+
+    rune_leaf_scores = np.fromiter(
+        (rune.data.points * rune.data.mult for rune in owned_runes),
+        np.float64,
+        len(owned_runes),
+    )
+
+    return PlacementBatch(
+        base_score=tree_score(scores),
+        parent_view_indices=legal_parents,
+        parent_multipliers=path_multipliers(scores, depths)[legal_parents],
+        rune_leaf_scores=rune_leaf_scores,
+    )
+
+
+def _rank_chunk(
+    parent_view_indices: NDArray[np.int64],
+    parent_multipliers: NDArray[np.float64],
+    rune_leaf_scores: NDArray[np.float64],
+    base_score: float,
+    limit: int | None,
+) -> tuple[NDArray[np.int64], NDArray[np.int64], NDArray[np.float64]]:
+    """Scores every (parent, rune) pair of a chunk and keeps its best `limit`."""
+    totals = (base_score + np.outer(parent_multipliers, rune_leaf_scores)).ravel()
+
+    if limit is not None and limit < len(totals):
+        best = np.argpartition(totals, -limit)[-limit:]
+    else:
+        best = np.arange(len(totals))
+
+    rune_count = len(rune_leaf_scores)
+    return parent_view_indices[best // rune_count], best % rune_count, totals[best]
+
+
+def rank_placements(
+    batch: PlacementBatch, limit: int | None = None, executor: Executor | None = None
+) -> list[Placement]:
+    """
+    Ranks every legal (rune, parent) draft by resulting tree score, best first.
+    Large batches are split across `executor` (e.g. a `ProcessPoolExecutor`).
+    """
+    placement_count = len(batch.parent_view_indices) * len(batch.rune_leaf_scores)
+    if placement_count == 0:
+        return []
+
+    if executor is None or placement_count < PROCESS_POOL_MIN_PLACEMENTS:
+        chunks = [
+            _rank_chunk(
+                batch.parent_view_indices,
+                batch.parent_multipliers,
+                batch.rune_leaf_scores,
+                batch.base_score,
+                limit,
+            )
+        ]
+    else:
+        parents_per_chunk = max(1, PLACEMENTS_PER_CHUNK // len(batch.rune_leaf_scores))
+        futures = [
+            executor.submit(
+                _rank_chunk,
+                batch.parent_view_indices[start : start + parents_per_chunk],
+                batch.parent_multipliers[start : start + parents_per_chunk],
+                batch.rune_leaf_scores,
+                batch.base_score,
+                limit,
+            )
+            for start in range(0, len(batch.parent_view_indices), parents_per_chunk)
+        ]
+        chunks = [future.result() for future in futures]
+
+    parents = np.concatenate([chunk[0] for chunk in chunks])
+    runes = np.concatenate([chunk[1] for chunk in chunks])
+    totals = np.concatenate([chunk[2] for chunk in chunks])
+
+    # Ties rank in tree, then inventory order (ties cut off by `limit` are arbitrary)
+    order = np.lexsort((runes, parents, -totals))[:limit]
+    return [
+        Placement(rune_index, parent_view_index, score)
+        for rune_index, parent_view_index, score in zip(
+            runes[order].tolist(), parents[order].tolist(), totals[order].tolist()
+        )
+    ]
+
+
+def _collect_and_rank(
+    items: list[TreeViewItem],
+    scores: TreeScores,
+    owned_runes: list[Rune],
+    limit: int | None,
+    pool: Executor | None,
+) -> list[Placement]:
+    return rank_placements(collect_placements(items, scores, owned_runes), limit, pool)
+
+
+def submit_ranking(
+    background: Executor,
+    items: list[TreeViewItem],
+    scores: TreeScores,
+    owned_runes: list[Rune],
+    limit: int | None = None,
+    pool: Executor | None = None,
+) -> Future[list[Placement]]:
+    """
+    Collects and ranks on a `background` thread (which fans out to `pool` for
+    large batches), so the UI only polls `future.done()` each frame instead of
+    blocking on it. The caller's thread only takes a snapshot of its inputs.
+    """
+    # Inserts shift `parents` in place, every other array is replaced
+    frozen_scores = replace(scores, parents=scores.parents.copy())
+    return background.submit(
+        _collect_and_rank, copy_tree_view(items), frozen_scores, list(owned_runes), limit, pool
+    )
+
+
+def start_draft_ranking(ctx: Context) -> None:
+    """Ranks every placement of the current tree and inventory for `best_placement`."""
+    ranker = ctx.draft_ranker
+    if ranker is None:
+        return
+
+    if ranker.background is None:
+        ranker.background = ThreadPoolExecutor(max_workers=1, thread_name_prefix="draft-ranking")
+        # Forking the game's own threads (frame writer, key reader) is unsafe, spawn instead
+        ranker.pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context("spawn"))
+    if ranker.ranking is not None:
+        _ = ranker.ranking.cancel()
+
+    ranker.ranking = submit_ranking(
+        ranker.background,
+        get_tree_view(ctx),
+        get_tree_scores(ctx),
+        ctx.owned_runes,
+        DRAFT_RANKING_LIMIT,
+        ranker.pool,
+    )
+    ranker.version = ctx.tree_version
+
+
+def best_placement(ctx: Context) -> Placement | None:
+    """The best placement once ranked, `None` while ranking or after the tree changed."""
+    ranker = ctx.draft_ranker
+    if ranker is None or ranker.ranking is None or not ranker.ranking.done():
+        return None
+    if ranker.version != ctx.tree_version or ranker.ranking.cancelled():
+        return None
+
+    error = ranker.ranking.exception()
+    if error is not None:
+        # Reported once, the game goes on without a hint until the next draft
+        ranker.ranking = None
+        if isinstance(error, BrokenExecutor) and ranker.pool is not None:
+            # A worker died, later rankings run on the background thread instead
+            ranker.pool.shutdown(wait=False, cancel_futures=True)
+            ranker.pool = None
+        ctx.debug_line = f"Draft ranking failed: {error!r}"
+        return None
+
+    placements = ranker.ranking.result()
+    return placements[0] if placements else None
+
+
+def stop_draft_ranker(ranker: DraftRanker) -> None:
+    for executor in (ranker.background, ranker.pool):
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -1,11 +1,23 @@
 from dataclasses import dataclass, field
-from typing import cast
 
 import numpy as np
 from blessed import Terminal
 from numpy.typing import NDArray
 
-from branch_game.screen_buffer import Screen, ScreenBuffer
+from branch_game.compositor import CELL_DTYPE, blend_cells, blend_rect, fill_background
+from branch_game.screen_buffer import (
+    BLANK_GLYPH,
+    AnyScreen,
+    ArrayScreen,
+    CellRun,
+    CompositeScreen,
+    ScreenBuffer,
+    ScreenCell,
+    mark_all_dirty,
+    mark_dirty,
+    pack_cell,
+)
+from branch_game.style_cache import StyleCache, intern_rgb_style, lookup_style, store_style
 
 
 @dataclass
@@ -31,34 +43,68 @@ class RichText:
     bg: RGBA | None = None
 
 
-def _make_style(term: Terminal, fg: RGBA, bg: RGBA | None, bold: bool) -> str:
-    if not term.does_styling:
-        return term.normal
-
-    fg_str = term.color_rgb(*_rgba_to_rgb_int(fg))
-    maybe_bold_str: str = term.bold if bold else ""
-    style: str = (
-        term.normal
-        + maybe_bold_str
-        + fg_str
-        + term.on_color_rgb(*_rgba_to_rgb_int(BACKGROUND_COLOR))
-    )
-    return style
-
-
 def _rgba_to_rgb_int(col_rgba: RGBA) -> tuple[int, int, int]:
-    col_rgb = np.array(col_rgba[:3], dtype=np.float64)
-    alpha = cast(float, col_rgba[3])
+    # Plain floats: NumPy's per-call overhead dwarfs the math for 3 values
+    alpha = col_rgba.a
+    r = min(max(round(col_rgba.r * alpha * 255), 0), 255)
+    g = min(max(round(col_rgba.g * alpha * 255), 0), 255)
+    b = min(max(round(col_rgba.b * alpha * 255), 0), 255)
+    return r, g, b
 
-    # scale and round
-    scaled: NDArray[np.int_] = np.clip(np.round(col_rgb * alpha * 255), 0, 255).astype(int)
 
-    r, g, b = scaled  # pyright:ignore[reportAny]
-    return r, g, b
+def intern_style(term: Terminal, cache: StyleCache, fg: RGBA, bg: RGBA | None, bold: bool) -> int:
+    """Returns the style ID for the quantized (fg, bg, bold), building its escape on a miss."""
+    # Only `CompositeScreen` blends backgrounds, elsewhere every cell sits on BACKGROUND_COLOR
+    bg_rgb = _rgba_to_rgb_int(BACKGROUND_COLOR)
+    return intern_rgb_style(term, cache, _rgba_to_rgb_int(fg), bg_rgb, bold)
+
 
+def _composite_cells(text: list[RichText]) -> NDArray[np.void]:
+    """`CompositeScreen` layer cells for `text`, with colors and alphas left unquantized."""
+    cells = np.zeros(sum(len(text_segment.text) for text_segment in text), dtype=CELL_DTYPE)
+    px = 0
 
-def fill_screen_background(terminal: Terminal, screen: Screen, color: RGBA):
-    bg_style = terminal.on_color_rgb(*_rgba_to_rgb_int(color))
+    for text_segment in text:
+        segment = cells[px : px + len(text_segment.text)]
+        segment["glyph"] = np.frombuffer(text_segment.text.encode("utf-32-le"), dtype=np.uint32)
+        color = text_segment.color
+        segment["fg"] = (color.r, color.g, color.b)
+        segment["fg_alpha"] = color.a
+        if text_segment.bg is not None:
+            bg = text_segment.bg
+            segment["bg"] = (bg.r, bg.g, bg.b)
+            segment["bg_alpha"] = bg.a
+        segment["bold"] = text_segment.bold
+        px += len(text_segment.text)
+
+    return cells
+
+
+def clear_to_background(terminal: Terminal, color: RGBA) -> str:
+    """
+    Escapes clearing the whole terminal to `color`, on terminals that erase with
+    the current background. A few bytes instead of `fill_screen_background`'s full redraw.
+    """
+    return terminal.on_color_rgb(*_rgba_to_rgb_int(color)) + terminal.clear
+
+
+def fill_screen_background(terminal: Terminal, screen: AnyScreen, color: RGBA):
+    if isinstance(screen, CompositeScreen):
+        alpha = color.a
+        fill_background(screen.new_buffer, (color.r * alpha, color.g * alpha, color.b * alpha))
+        return
+
+    key = ("bg", _rgba_to_rgb_int(color))
+    style_id = lookup_style(screen.styles, key)
+    if style_id is None:
+        style_id = store_style(screen.styles, key, terminal.on_color_rgb(*key[1]))
+
+    mark_all_dirty(screen.new_buffer)
+    if isinstance(screen, ArrayScreen):
+        screen.new_buffer.cells.fill(pack_cell(BLANK_GLYPH, style_id))
+        return
+
+    bg_style = screen.styles.escapes[style_id]
 
     for y in range(screen.new_buffer.height):
         for x in range(screen.new_buffer.width):
@@ -66,24 +112,123 @@ def fill_screen_background(terminal: Terminal, screen: Screen, color: RGBA):
 
 
 def print_at(
-    term: Terminal, screen: Screen, x: int, y: int, text: RichText | list[RichText]
+    term: Terminal, screen: AnyScreen, x: int, y: int, text: RichText | list[RichText]
 ) -> None:
     """Draws rich text into the screen buffer at (x, y). Each character is styled individually."""
-    buffer: ScreenBuffer = screen.new_buffer
-
     # Normalize text to list in case of RichText for simplicity
     if isinstance(text, RichText):
         text = [text]
 
+    if isinstance(screen, ArrayScreen):
+        _print_at_array(term, screen, x, y, text)
+        return
+    if isinstance(screen, CompositeScreen):
+        blend_cells(screen.new_buffer, x, y, _composite_cells(text))
+        return
+
+    buffer: ScreenBuffer = screen.new_buffer
+
     if not (0 <= y < buffer.height):
         return  # Y out of bounds
 
     px = x  # track horizontal position across segments
     cells = buffer.cells
 
+    escapes = screen.styles.escapes
+
     for text_segment in text:
-        style = _make_style(term, text_segment.color, text_segment.bg, text_segment.bold)
+        style_id = intern_style(
+            term, screen.styles, text_segment.color, text_segment.bg, text_segment.bold
+        )
+        style = escapes[style_id]
         for char in text_segment.text:
             if 0 <= px < buffer.width:
                 cells[y][px] = (char, style)
             px += 1
+
+    mark_dirty(buffer, y, max(x, 0), min(px, buffer.width))
+
+
+def _print_at_array(
+    term: Terminal, screen: ArrayScreen, x: int, y: int, text: list[RichText]
+) -> None:
+    """Array backend of `print_at`, writing each segment as one row slice."""
+    if not (0 <= y < screen.height):
+        return  # Y out of bounds
+
+    row = screen.new_buffer.cells[y]
+    px = x
+
+    for text_segment in text:
+        start = max(px, 0)
+        end = min(px + len(text_segment.text), screen.width)
+        if start < end:
+            style_id = intern_style(
+                term, screen.styles, text_segment.color, text_segment.bg, text_segment.bold
+            )
+            style_bits = np.uint64(pack_cell(0, style_id))
+            visible = text_segment.text[start - px : end - px]
+            glyphs = np.frombuffer(visible.encode("utf-32-le"), dtype=np.uint32)
+            row[start:end] = glyphs | style_bits
+        px += len(text_segment.text)
+
+    mark_dirty(screen.new_buffer, y, max(x, 0), min(px, screen.width))
+
+
+def prerender(term: Terminal, screen: AnyScreen, text: RichText | list[RichText]) -> CellRun:
+    """Styles `text` once into cells that `blit_at` can copy into any frame."""
+    if isinstance(text, RichText):
+        text = [text]
+
+    if isinstance(screen, CompositeScreen):
+        return CellRun(_composite_cells(text))
+
+    if isinstance(screen, ArrayScreen):
+        runs: list[NDArray[np.uint64]] = []
+        for text_segment in text:
+            style_id = intern_style(
+                term, screen.styles, text_segment.color, text_segment.bg, text_segment.bold
+            )
+            glyphs = np.frombuffer(text_segment.text.encode("utf-32-le"), dtype=np.uint32)
+            runs.append(glyphs | np.uint64(pack_cell(0, style_id)))
+        return CellRun(np.concatenate(runs) if runs else np.empty(0, dtype=np.uint64))
+
+    cells: list[ScreenCell] = []
+    escapes = screen.styles.escapes
+    for text_segment in text:
+        style_id = intern_style(
+            term, screen.styles, text_segment.color, text_segment.bg, text_segment.bold
+        )
+        style = escapes[style_id]
+        cells.extend((char, style) for char in text_segment.text)
+    return CellRun(cells)
+
+
+def blit_at(screen: AnyScreen, x: int, y: int, run: CellRun) -> None:
+    """Copies prerendered cells into the screen buffer at (x, y)."""
+    if isinstance(screen, CompositeScreen):
+        blend_cells(screen.new_buffer, x, y, run.cells)  # pyright:ignore[reportArgumentType]
+        return
+
+    if not (0 <= y < screen.height):
+        return  # Y out of bounds
+
+    start = max(x, 0)
+    end = min(x + len(run.cells), screen.width)
+    if start >= end:
+        return
+
+    if isinstance(screen, ArrayScreen):
+        screen.new_buffer.cells[y, start:end] = run.cells[start - x : end - x]
+    else:
+        screen.new_buffer.cells[y][start:end] = run.cells[start - x : end - x]
+    mark_dirty(screen.new_buffer, y, start, end)
+
+
+def overlay_rect(screen: AnyScreen, x: int, y: int, width: int, height: int, color: RGBA) -> None:
+    """
+    Blends a translucent `color` panel over everything drawn so far. Only
+    `CompositeScreen` can blend, other backends leave the screen as is.
+    """
+    if isinstance(screen, CompositeScreen):
+        blend_rect(screen.new_buffer, x, y, width, height, (color.r, color.g, color.b), color.a)
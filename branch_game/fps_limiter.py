@@ -1,17 +1,155 @@
+from __future__ import annotations
+
+import csv
+import json
 import time
+from array import array
+from dataclasses import dataclass, field
+from enum import Enum, auto
 from typing import Callable
 
 
+class LimiterStrategy(Enum):
+    # Sleep in `poll_interval` steps, then busy-wait the last `spin_reserve`
+    SPIN = auto()
+    # One sleep ending early by the measured worst-case oversleep, spin only for that
+    ADAPTIVE = auto()
+    # Never spin, wake-ups land within the OS sleep jitter
+    SLEEP = auto()
+
+
+@dataclass
+class FrameTrace:
+    """Fixed-size ring buffer of what the limiter measured for each frame, in seconds."""
+
+    capacity: int = 8192
+    count: int = 0
+    frame_end: array[float] = field(init=False)
+    frame_time: array[float] = field(init=False)
+    # Wake-up time minus target time; positive is oversleep, negative undersleep
+    wake_error: array[float] = field(init=False)
+    resynced: array[int] = field(init=False)
+
+    def __post_init__(self):
+        self.frame_end = array("d", bytes(8 * self.capacity))
+        self.frame_time = array("d", bytes(8 * self.capacity))
+        self.wake_error = array("d", bytes(8 * self.capacity))
+        self.resynced = array("b", bytes(self.capacity))
+
+
+def record_frame(trace: FrameTrace, end: float, dt: float, error: float, resynced: bool) -> None:
+    slot = trace.count % trace.capacity
+    trace.frame_end[slot] = end
+    trace.frame_time[slot] = dt
+    trace.wake_error[slot] = error
+    trace.resynced[slot] = resynced
+    trace.count += 1
+
+
+def _trace_slots(trace: FrameTrace) -> range | list[int]:
+    """Ring slots from oldest to newest."""
+    if trace.count <= trace.capacity:
+        return range(trace.count)
+    start = trace.count % trace.capacity
+    return [*range(start, trace.capacity), *range(start)]
+
+
+def export_chrome_trace(trace: FrameTrace, path: str) -> None:
+    """Writes Chrome trace-event JSON, viewable in chrome://tracing or Perfetto."""
+    events: list[dict[str, object]] = []
+    for slot in _trace_slots(trace):
+        end_us = trace.frame_end[slot] * 1e6
+        dt_us = trace.frame_time[slot] * 1e6
+        events.append(
+            {"name": "frame", "ph": "X", "ts": end_us - dt_us, "dur": dt_us, "pid": 0, "tid": 0}
+        )
+        events.append(
+            {
+                "name": "wake_error_us",
+                "ph": "C",
+                "ts": end_us,
+                "pid": 0,
+                "args": {"error": trace.wake_error[slot] * 1e6},
+            }
+        )
+        if trace.resynced[slot]:
+            events.append({"name": "resync", "ph": "i", "ts": end_us, "pid": 0, "tid": 0, "s": "t"})
+
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+def export_csv(trace: FrameTrace, path: str) -> None:
+    with open(path, "w", newline="", encoding="utf-8") as file:
+        writer = csv.writer(file)
+        writer.writerow(["frame", "end_s", "frame_time_ms", "wake_error_ms", "resynced"])
+        first_frame = max(0, trace.count - trace.capacity)
+        for frame, slot in enumerate(_trace_slots(trace), start=first_frame):
+            writer.writerow(
+                [
+                    frame,
+                    f"{trace.frame_end[slot]:.6f}",
+                    f"{trace.frame_time[slot] * 1e3:.4f}",
+                    f"{trace.wake_error[slot] * 1e3:.4f}",
+                    trace.resynced[slot],
+                ]
+            )
+
+
+def export_trace(trace: FrameTrace, path: str) -> None:
+    """CSV for `.csv` paths, Chrome trace-event JSON otherwise."""
+    if path.endswith(".csv"):
+        export_csv(trace, path)
+    else:
+        export_chrome_trace(trace, path)
+
+
+@dataclass
+class FPSLimiter:
+    # Blocks until the next frame is due and returns the frame time
+    wait_for_next_frame: Callable[[], float]
+    # Paces the next frame from now, for when the loop stopped waiting on frames (e.g. while idle)
+    resync: Callable[[], None]
+
+
+def measure_sleep_overshoot(samples: int = 50, duration: float = 0.001) -> tuple[float, float]:
+    """Median and p99 of how late `time.sleep(duration)` wakes up, in seconds."""
+    overshoots: list[float] = []
+    for _ in range(samples):
+        start = time.perf_counter()
+        time.sleep(duration)
+        overshoots.append(time.perf_counter() - start - duration)
+
+    overshoots.sort()
+    return overshoots[samples // 2], overshoots[min(samples - 1, int(samples * 0.99))]
+
+
 def create_fps_limiter(
     fps: float,
     poll_interval: float = 0.001,
     spin_reserve: float = 0.002,
-) -> Callable[[], float]:
+    trace: FrameTrace | None = None,
+    strategy: LimiterStrategy = LimiterStrategy.SPIN,
+    max_sleep_jitter: float = 0.0002,
+) -> FPSLimiter:
     """
     High-precision, drift-correcting frame limiter.
     Keeps perfect alignment with wall time to avoid visible jitter.
+    Every frame is recorded into `trace` when one is given.
+
+    ADAPTIVE measures the OS sleep overshoot once and falls back to SLEEP
+    when its spread is within `max_sleep_jitter`.
     """
     target = 1.0 / float(fps)
+
+    # How early the single sleep of ADAPTIVE/SLEEP has to end
+    wake_margin = 0.0
+    if strategy != LimiterStrategy.SPIN:
+        median_overshoot, worst_overshoot = measure_sleep_overshoot()
+        if worst_overshoot - median_overshoot <= max_sleep_jitter:
+            strategy = LimiterStrategy.SLEEP
+        wake_margin = median_overshoot if strategy == LimiterStrategy.SLEEP else worst_overshoot
+
     next_frame = time.perf_counter() + target
 
     def wait_for_next_frame() -> float:
@@ -19,20 +157,25 @@ def create_fps_limiter(
         target_time = next_frame
         now = time.perf_counter()
 
-        # --- Sleep until close to target ---
-        while True:
-            remaining = target_time - now - spin_reserve
-            if remaining <= 0:
-                break
-            time.sleep(min(poll_interval, remaining))
-            now = time.perf_counter()
+        if strategy == LimiterStrategy.SPIN:
+            # --- Sleep until close to target ---
+            while True:
+                remaining = target_time - now - spin_reserve
+                if remaining <= 0:
+                    break
+                time.sleep(min(poll_interval, remaining))
+                now = time.perf_counter()
+        else:
+            remaining = target_time - now - wake_margin
+            if remaining > 0:
+                time.sleep(remaining)
 
-        # --- Spin for last couple ms for precision ---
-        while time.perf_counter() < target_time:
-            pass
+        # --- Spin for the remaining error for precision ---
+        if strategy != LimiterStrategy.SLEEP:
+            while time.perf_counter() < target_time:
+                pass
 
         end = time.perf_counter()
-
         # --- Compute actual frame time ---
         dt = end - (next_frame - target)
 
@@ -40,9 +183,17 @@ def create_fps_limiter(
         next_frame = target_time + target
 
         # If we’re very late, resync instead of stacking drift
-        if end > next_frame:
+        resynced = end > next_frame
+        if resynced:
             next_frame = end + target
 
+        if trace is not None:
+            record_frame(trace, end, dt, end - target_time, resynced)
+
         return dt
 
-    return wait_for_next_frame
+    def resync() -> None:
+        nonlocal next_frame
+        next_frame = time.perf_counter() + target
+
+    return FPSLimiter(wait_for_next_frame, resync)
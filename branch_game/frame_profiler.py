@@ -0,0 +1,91 @@
+from time import perf_counter_ns
+
+from blessed import Terminal
+
+from branch_game.data_types import FrameProfiler, ProfilerStage
+from branch_game.ezterm import RGBA, RichText, overlay_rect, print_at
+from branch_game.screen_buffer import AnyScreen
+from branch_game.style_cache import style_cache_hit_rate
+
+PERCENTILES = (50, 95, 99)
+
+
+def toggle_profiler(profiler: FrameProfiler) -> None:
+    profiler.enabled = not profiler.enabled
+    profiler.frame_count = 0
+
+
+def begin_frame(profiler: FrameProfiler) -> None:
+    if not profiler.enabled:
+        return
+
+    slot = profiler.frame_count % profiler.window
+    for stage_ring in profiler.stage_ns:
+        stage_ring[slot] = 0
+    profiler.last_mark_ns = perf_counter_ns()
+
+
+def mark(profiler: FrameProfiler, stage: ProfilerStage) -> None:
+    """Charges the time since the previous mark to `stage`."""
+    if not profiler.enabled:
+        return
+
+    now = perf_counter_ns()
+    slot = profiler.frame_count % profiler.window
+    profiler.stage_ns[stage][slot] += now - profiler.last_mark_ns
+    profiler.last_mark_ns = now
+
+
+def end_frame(profiler: FrameProfiler, bytes_flushed: int, cells_diffed: int) -> None:
+    if not profiler.enabled:
+        return
+
+    slot = profiler.frame_count % profiler.window
+    profiler.bytes_flushed[slot] = bytes_flushed
+    profiler.cells_diffed[slot] = cells_diffed
+    profiler.frame_count += 1
+
+
+def _percentiles(ring: list[int]) -> tuple[int, ...]:
+    ordered = sorted(ring)
+    last = len(ordered) - 1
+    return tuple(ordered[round(last * percentile / 100)] for percentile in PERCENTILES)
+
+
+def frame_percentiles(profiler: FrameProfiler) -> dict[str, tuple[int, ...]]:
+    """p50/p95/p99 of every stage (in ns) and of the per-frame counters."""
+    filled = min(profiler.frame_count, profiler.window)
+    if filled == 0:
+        return {}
+
+    stats = {
+        stage.name.lower(): _percentiles(profiler.stage_ns[stage].tolist()[:filled])
+        for stage in ProfilerStage
+    }
+    stats["bytes"] = _percentiles(profiler.bytes_flushed.tolist()[:filled])
+    stats["cells"] = _percentiles(profiler.cells_diffed.tolist()[:filled])
+    return stats
+
+
+def render_profiler_overlay(terminal: Terminal, screen: AnyScreen, profiler: FrameProfiler) -> None:
+    if not profiler.enabled:
+        return
+
+    lines = ["stage (ms)    p50     p95     p99"]
+    for name, (p50, p95, p99) in frame_percentiles(profiler).items():
+        if name in ("bytes", "cells"):
+            lines.append(f"{name:<10} {p50:>7} {p95:>7} {p99:>7}")
+        else:
+            lines.append(f"{name:<10} {p50 / 1e6:>7.3f} {p95 / 1e6:>7.3f} {p99 / 1e6:>7.3f}")
+    # Since startup, evictions recycle style IDs and force repaints of the cells using them
+    styles = screen.styles
+    lines.append(f"styles {style_cache_hit_rate(styles):>8.1%} hits {styles.evictions:>6} evicted")
+
+    # Right-aligned under the FPS counter
+    width = max(len(line) for line in lines)
+    x = max(0, screen.width - width - 1)
+    # Dims the rows underneath where the screen can blend, padded by a column on each side
+    overlay_rect(screen, x - 1, 1, width + 2, len(lines), RGBA(0.05, 0.05, 0.1, 0.8))
+    color = RGBA(1.0, 1.0, 1.0, 0.7)
+    for y, line in enumerate(lines, start=1):
+        print_at(terminal, screen, x, y, RichText(line, color))
@@ -0,0 +1,151 @@
+"""
+Frame output written straight to the terminal's file descriptor by a writer thread.
+
+Each flushed frame is encoded once into a reused buffer and sent with as few
+`os.write` calls as the kernel allows, wrapped in synchronized update markers
+(DEC private mode 2026) where the terminal supports them, so it never shows a
+half-drawn frame. While a frame is still being written the game draws no new
+ones; see `frame_writer_busy`. On Windows, frames for the console go through
+`sys.stdout.buffer` instead of the raw file descriptor.
+"""
+
+import os
+import sys
+import threading
+from dataclasses import dataclass, field
+from typing import BinaryIO
+
+from blessed import Terminal
+from blessed.dec_modes import DecPrivateMode
+
+BEGIN_SYNCHRONIZED_UPDATE = b"\x1b[?2026h"
+END_SYNCHRONIZED_UPDATE = b"\x1b[?2026l"
+
+INITIAL_BUFFER_SIZE = 1 << 16
+# Terminals that do not know DECRQM never answer, keep startup short for them
+DEC_MODE_QUERY_TIMEOUT = 0.1
+
+
+@dataclass
+class FrameWriter:
+    """`OutputSink` handing every flushed frame to a writer thread."""
+
+    fd: int
+    # Wrap frames in synchronized update markers
+    synchronized: bool = False
+    frames_written: int = 0
+    # Frames not drawn because the previous one was still being written
+    frames_dropped: int = 0
+    bytes_written: int = 0
+    buffer: bytearray = field(default_factory=lambda: bytearray(INITIAL_BUFFER_SIZE), repr=False)
+    # Bytes of `buffer` holding the frame being written
+    size: int = 0
+    error: OSError | None = None
+    # Written to instead of `fd` when set
+    stream: BinaryIO | None = field(default=None, repr=False)
+    _pending: list[str] = field(default_factory=list[str], repr=False)
+    # Set while no frame is being written, only then may `buffer` change
+    idle: threading.Event = field(default_factory=threading.Event, repr=False)
+    # Wakes the writer thread for a new frame, or to exit once `closed`
+    submitted: threading.Event = field(default_factory=threading.Event, repr=False)
+    closed: bool = False
+    thread: threading.Thread | None = field(default=None, repr=False)
+
+    def write(self, data: str, /) -> int:
+        self._pending.append(data)
+        return len(data)
+
+    def flush(self) -> None:
+        frame = "".join(self._pending)
+        self._pending.clear()
+        if not frame:
+            return
+
+        # Only reached while busy when a caller skipped `frame_writer_busy`
+        _ = self.idle.wait()
+        if self.error is not None:
+            raise self.error
+
+        data = frame.encode("utf-8")
+        markers = len(BEGIN_SYNCHRONIZED_UPDATE) if self.synchronized else 0
+        size = len(data) + 2 * markers
+        buffer = self.buffer
+        if size > len(buffer):
+            buffer.extend(bytes(size - len(buffer)))
+
+        # Same-length slice assignments, the buffer is filled in place
+        offset = 0
+        if self.synchronized:
+            buffer[:markers] = BEGIN_SYNCHRONIZED_UPDATE
+            offset = markers
+        buffer[offset : offset + len(data)] = data
+        offset += len(data)
+        if self.synchronized:
+            buffer[offset:size] = END_SYNCHRONIZED_UPDATE
+
+        self.size = size
+        self.idle.clear()
+        self.submitted.set()
+
+
+def _write_frames(writer: FrameWriter) -> None:
+    while True:
+        _ = writer.submitted.wait()
+        writer.submitted.clear()
+        if writer.closed:
+            return
+
+        try:
+            with memoryview(writer.buffer) as view:
+                if writer.stream is not None:
+                    _ = writer.stream.write(view[: writer.size])
+                    writer.stream.flush()
+                else:
+                    offset = 0
+                    while offset < writer.size:
+                        offset += os.write(writer.fd, view[offset : writer.size])
+            writer.frames_written += 1
+            writer.bytes_written += writer.size
+        except OSError as error:
+            writer.error = error
+        writer.idle.set()
+
+
+def supports_synchronized_output(terminal: Terminal) -> bool:
+    """Asks the terminal about mode 2026, needs `terminal.cbreak()` to read the reply."""
+    response = terminal.get_dec_mode(
+        DecPrivateMode.SYNCHRONIZED_OUTPUT, timeout=DEC_MODE_QUERY_TIMEOUT
+    )
+    return response.supported
+
+
+def start_frame_writer(fd: int, synchronized: bool = False) -> FrameWriter:
+    # Whatever was written through sys.stdout must reach the terminal first
+    sys.stdout.flush()
+    writer = FrameWriter(fd, synchronized)
+    if os.name == "nt" and fd == sys.stdout.fileno():
+        # A console handle decodes raw bytes with the console code page,
+        # `sys.stdout` writes them to the console as UTF-8 text
+        writer.stream = sys.stdout.buffer
+    writer.idle.set()
+    writer.thread = threading.Thread(
+        target=_write_frames, args=(writer,), name="frame-writer", daemon=True
+    )
+    writer.thread.start()
+    return writer
+
+
+def frame_writer_busy(writer: FrameWriter) -> bool:
+    """Whether the previous frame is still being written, drawing a new one would be wasted."""
+    return not writer.idle.is_set()
+
+
+def stop_frame_writer(writer: FrameWriter) -> None:
+    """Waits for the last frame to be written and ends the writer thread."""
+    if writer.error is None:
+        writer.flush()
+    _ = writer.idle.wait()
+    writer.closed = True
+    writer.submitted.set()
+    if writer.thread is not None:
+        writer.thread.join()
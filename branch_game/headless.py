@@ -0,0 +1,118 @@
+import io
+from collections import deque
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from functools import partial
+
+from blessed import Terminal
+from blessed.keyboard import Keystroke, get_keyboard_sequences
+
+import branch_game.ezterm as ezterm
+from branch_game.data_types import Context, FPSCounter
+from branch_game.main import ProgramStatus, create_context, tick
+from branch_game.screen_buffer import Screen
+
+ESCAPE = "\x1b"
+
+
+@dataclass
+class MemorySink:
+    """In-memory `OutputSink` counting what each frame would have sent to the terminal."""
+
+    # Keep every flushed frame, for byte-exact comparisons
+    keep_frames: bool = False
+    frames: list[str] = field(default_factory=list[str])
+    last_frame: str = ""
+    frame_count: int = 0
+    bytes_written: int = 0
+    escape_sequences: int = 0
+    _pending: list[str] = field(default_factory=list[str], repr=False)
+
+    def write(self, data: str, /) -> int:
+        self._pending.append(data)
+        return len(data)
+
+    def flush(self) -> None:
+        frame = "".join(self._pending)
+        self._pending.clear()
+
+        self.last_frame = frame
+        self.frame_count += 1
+        self.bytes_written += len(frame.encode("utf-8"))
+        self.escape_sequences += frame.count(ESCAPE)
+        if self.keep_frames:
+            self.frames.append(frame)
+
+
+@dataclass
+class ScriptedKeySource:
+    """`KeySource` replaying a fixed key sequence, then reporting no input."""
+
+    keys: deque[Keystroke] = field(default_factory=deque[Keystroke])
+
+    def inkey(self, timeout: float | None = None) -> Keystroke:
+        return self.keys.popleft() if self.keys else Keystroke("")
+
+    def kbhit(self, timeout: float | None = None) -> bool:
+        # Never blocks, a script has no input to wait for
+        return bool(self.keys)
+
+
+def scripted_keys(terminal: Terminal, keys: Iterable[str]) -> ScriptedKeySource:
+    """
+    Builds a key source from plain characters, `KEY_*` names (e.g. "KEY_UP")
+    and "" for frames without input, resolved the way `terminal.inkey` would.
+    """
+    sequences_by_code: dict[int, str] = {}
+    for sequence, code in get_keyboard_sequences(terminal).items():
+        _ = sequences_by_code.setdefault(code, sequence)
+
+    keystrokes: deque[Keystroke] = deque()
+    for key in keys:
+        if key.startswith("KEY_"):
+            code: int = getattr(terminal, key)
+            keystrokes.append(Keystroke(sequences_by_code.get(code, key), code, key))
+        else:
+            keystrokes.append(Keystroke(key))
+
+    return ScriptedKeySource(keystrokes)
+
+
+def create_headless_terminal(kind: str = "xterm-256color") -> Terminal:
+    return Terminal(kind=kind, stream=io.StringIO(), force_styling=True)
+
+
+def create_headless_context(
+    width: int = 80,
+    height: int = 24,
+    keys: Iterable[str] = (),
+    kind: str = "xterm-256color",
+    keep_frames: bool = False,
+) -> Context:
+    terminal = create_headless_terminal(kind)
+    return create_context(
+        terminal,
+        Screen(width, height),
+        keys=scripted_keys(terminal, keys),
+        output=MemorySink(keep_frames=keep_frames),
+    )
+
+
+def run_headless(
+    ctx: Context,
+    frames: int,
+    delta_time: float = 1.0 / 144.0,
+    fps_counter: FPSCounter | None = None,
+) -> ProgramStatus:
+    """Runs up to `frames` ticks back to back with a fixed `delta_time`."""
+    print_at = partial(ezterm.print_at, ctx.terminal, ctx.screen)
+    fps_counter = fps_counter if fps_counter is not None else FPSCounter()
+
+    status = ProgramStatus.RUNNING
+    for _ in range(frames):
+        status = tick(ctx, delta_time, print_at, fps_counter)
+        if status == ProgramStatus.EXIT:
+            break
+        ctx.tick_count += 1
+
+    return status
@@ -8,5 +8,6 @@ from branch_game.data_types import Node
 
 def insert_child(parent: Node, index: int, child: Node):
     """Mutates `parent`"""
-    parent.children.append(child)
+    parent.children.insert(index, child)
     child.parent = parent
+    parent.version += 1
@@ -0,0 +1,58 @@
+import asyncio
+import sys
+from collections import deque
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from functools import partial
+
+from blessed import Terminal
+from blessed.keyboard import Keystroke
+
+
+@dataclass
+class QueueKeySource:
+    """`KeySource` filled by an event loop stdin reader, reading it never blocks a frame."""
+
+    keys: deque[Keystroke] = field(default_factory=deque[Keystroke])
+    # Set whenever keys are queued, lets an idle loop await input
+    arrived: asyncio.Event = field(default_factory=asyncio.Event)
+
+    def inkey(self, timeout: float | None = None) -> Keystroke:
+        return self.keys.popleft() if self.keys else Keystroke("")
+
+    def kbhit(self, timeout: float | None = None) -> bool:
+        return bool(self.keys)
+
+
+def read_pending_keys(terminal: Terminal, source: QueueKeySource) -> None:
+    """Moves every key the terminal has received into the queue."""
+    key = terminal.inkey(timeout=0.0)
+    while key:
+        source.keys.append(key)
+        key = terminal.inkey(timeout=0.0)
+
+    if source.keys:
+        source.arrived.set()
+
+
+def start_key_reader(terminal: Terminal, source: QueueKeySource) -> Callable[[], None]:
+    """
+    Feeds `source` from stdin on the running event loop and returns a function
+    that stops it. Needs a selector event loop, so POSIX only.
+    """
+    loop = asyncio.get_running_loop()
+    fd = sys.stdin.fileno()
+    loop.add_reader(fd, read_pending_keys, terminal, source)
+    return partial(loop.remove_reader, fd)
+
+
+async def wait_for_keys(source: QueueKeySource, timeout: float) -> bool:
+    if source.keys:
+        return True
+
+    source.arrived.clear()
+    try:
+        _ = await asyncio.wait_for(source.arrived.wait(), timeout)
+    except TimeoutError:
+        return False
+    return True
@@ -1,36 +1,98 @@
 from __future__ import annotations
 
+import argparse
 import math
+import sys
 from abc import ABC
 from enum import Enum, auto
 from functools import partial
-from typing import Callable, cast
+from typing import TYPE_CHECKING, Callable, cast
 
 from blessed import Terminal
 from blessed.keyboard import Keystroke
 
 import branch_game.ezterm as ezterm
-from branch_game.data import (
-    RUNE_RARITY_MAX_BRANCH_COUNT,
-    rune_rarity_color,
-    rune_rarity_max_branch_count,
-)
+from branch_game.color_depth import ColorDepth, color_depth_for
+from branch_game.data import RUNE_RARITY_MAX_BRANCH_COUNT
 from branch_game.data_types import (
     Context,
     DraftingNode,
+    DraftRanker,
     FPSCounter,
+    KeySource,
     NavigatingTree,
     Node,
+    ProfilerStage,
+    RowMode,
     Rune,
     RuneData,
     RuneRarity,
     TreeViewItem,
 )
-from branch_game.ezterm import BACKGROUND_COLOR, RGBA, RichText, fill_screen_background
+from branch_game.ezterm import (
+    BACKGROUND_COLOR,
+    RGBA,
+    RichText,
+    blit_at,
+    clear_to_background,
+)
 from branch_game.fps_counter import render_fps_counter, update_fps_counter
-from branch_game.fps_limiter import create_fps_limiter
-from branch_game.helpers import insert_child, tree_view_index_to_node_child_index
-from branch_game.screen_buffer import Screen, buffer_diff, flush_diffs
+from branch_game.fps_limiter import (
+    FPSLimiter,
+    FrameTrace,
+    LimiterStrategy,
+    create_fps_limiter,
+    export_trace,
+    record_frame,
+)
+from branch_game.frame_profiler import (
+    begin_frame,
+    end_frame,
+    mark,
+    render_profiler_overlay,
+    toggle_profiler,
+)
+from branch_game.frame_writer import (
+    FrameWriter,
+    frame_writer_busy,
+    start_frame_writer,
+    stop_frame_writer,
+    supports_synchronized_output,
+)
+from branch_game.node_store import create_child_node
+from branch_game.recording import (
+    RecordingKeySource,
+    start_recording,
+    stop_recording,
+    write_frame,
+)
+from branch_game.resize import (
+    apply_pending_resize,
+    install_loop_resize_handler,
+    install_resize_handler,
+    resize_pending,
+    wait_for_key_or_resize,
+)
+from branch_game.row_cache import format_row, get_cached_row
+from branch_game.screen_buffer import (
+    AnyScreen,
+    ArrayScreen,
+    CompositeScreen,
+    OutputSink,
+    Screen,
+    buffer_diff,
+    flush_diffs,
+)
+from branch_game.tree_view import (
+    get_tree_scores,
+    get_tree_view,
+    insert_child_in_view,
+    scroll_into_view,
+)
+
+# Only needed with --asyncio, asyncio alone takes a third of the startup imports
+if TYPE_CHECKING:
+    from branch_game.key_queue import QueueKeySource
 
 type PrintAtCallable = Callable[[int, int, RichText | list[RichText]], None]
 
@@ -40,6 +102,12 @@ class ProgramStatus(Enum):
     EXIT = auto()
 
 
+TARGET_FPS = 144
+
+# How long an idle loop blocks on input before checking in again
+IDLE_INPUT_TIMEOUT = 0.5
+
+
 class InputAction(Enum):
     MOVE_CURSOR_UP = auto()
     MOVE_CURSOR_DOWN = auto()
@@ -104,33 +172,32 @@ class InputAction(Enum):
 #         x_left -= gap
 
 
-def generate_tree_view(ctx: Context) -> list[TreeViewItem]:
-    tree_view: list[TreeViewItem] = []
+def is_animating(ctx: Context) -> bool:
+    # The ghost draft node pulses
+    return isinstance(ctx.state, DraftingNode)
 
-    def walk_tree(node: Node, depth: int = 0) -> list[TreeViewItem]:
-        out: list[TreeViewItem] = []
-        out.append(TreeViewItem(node, depth))
 
-        for child in node.children:
-            out.extend(walk_tree(child, depth + 1))
-        return out
+def needs_render(ctx: Context) -> bool:
+    return ctx.dirty or is_animating(ctx) or ctx.resize.last_event is not None
 
-    tree_view.extend(walk_tree(ctx.node_tree))
 
-    return tree_view
+def wait_for_input(ctx: Context, timeout: float) -> bool:
+    if ctx.resize.wakeup_fd is not None:
+        # Keys come from the terminal then, possibly through a recorder
+        return wait_for_key_or_resize(ctx.terminal, ctx.resize, timeout)
+    key_source: KeySource = ctx.keys if ctx.keys is not None else ctx.terminal
+    return key_source.kbhit(timeout=timeout)
 
 
-def tick(
-    ctx: Context,
-    delta_time: float,
-    print_at: PrintAtCallable,
-    fps_counter: FPSCounter,
-) -> ProgramStatus:
-    key: Keystroke = ctx.terminal.inkey(timeout=0.0)
+def handle_key(ctx: Context, key: Keystroke) -> ProgramStatus:
+    """Applies a single key press to the game state."""
     if key == "q":
         return ProgramStatus.EXIT
+    if key == "p":
+        toggle_profiler(ctx.profiler)
+        begin_frame(ctx.profiler)
 
-    tree_view: list[TreeViewItem] = generate_tree_view(ctx)
+    tree_view: list[TreeViewItem] = get_tree_view(ctx)
 
     # --- Hotkey to input action mapping ---
     maybe_input_action: InputAction | None = None
@@ -183,16 +250,16 @@ def tick(
             #     diff, Node(rune=ctx.owned_runes[ctx.state.selected_owned_rune_index])
             # )
             #
-            parent_node = tree_view[ctx.state.tree_view_index].node
-            insert_child(
-                parent_node,
+            # The draft is always the first child until MOVE_DRAFT_* lands
+            parent_view_index = ctx.state.tree_view_index - 1
+            drafted_node = create_child_node(
+                tree_view[parent_view_index].node, ctx.owned_runes[ctx.state.selected_rune_index]
             )
+            # Patches the cached `tree_view` in place for this frame
+            insert_child_in_view(ctx, parent_view_index, 0, drafted_node)
 
             _ = ctx.owned_runes.pop(ctx.state.selected_rune_index)
 
-            # Update tree this frame
-            tree_view = generate_tree_view(ctx)
-
             # revert back to pre-draft position
             ctx.state = NavigatingTree(ctx.state.tree_view_index)
 
@@ -221,6 +288,10 @@ def tick(
                 tree_view_index=ctx.state.selected_view_item_index + 1,
                 selected_rune_index=0,
             )
+            if ctx.draft_ranker is not None:
+                from branch_game.draft_evaluator import start_draft_ranking
+
+                start_draft_ranking(ctx)
             # parent_view_item=tree_view[ctx.state.selected_view_item_index],
             # draft_node_index_in_tree_view=ctx.state.selected_view_item_index + 1,
             # selected_owned_rune_index=0,
@@ -313,93 +384,126 @@ def tick(
     #     )
     #     ctx.debug_line = str(foo)
 
-    # This injects the extra ghost draft node into the tree
+    return ProgramStatus.RUNNING
+
+
+def tick(
+    ctx: Context,
+    delta_time: float,
+    print_at: PrintAtCallable,
+    fps_counter: FPSCounter,
+) -> ProgramStatus:
+    profiler = ctx.profiler
+    begin_frame(profiler)
+
+    # --- Terminal resize ---
+    if resize_pending(ctx) and not apply_pending_resize(ctx):
+        # Hold frames until a burst of resize events settles
+        return ProgramStatus.RUNNING
+
+    # Drain every pending key, so a burst of input lands in a single frame
+    key_source: KeySource = ctx.keys if ctx.keys is not None else ctx.terminal
+    key: Keystroke = key_source.inkey(timeout=0.0)
+    while key:
+        ctx.dirty = True
+        if handle_key(ctx, key) == ProgramStatus.EXIT:
+            return ProgramStatus.EXIT
+        key = key_source.inkey(timeout=0.0)
+
+    if not needs_render(ctx):
+        # Nothing changed, the previous frame is still on screen
+        return ProgramStatus.RUNNING
+    output = ctx.output
+    if isinstance(output, FrameWriter) and frame_writer_busy(output):
+        # The terminal is still taking the last frame, drop this one instead of queueing it
+        output.frames_dropped += 1
+        return ProgramStatus.RUNNING
+    mark(profiler, ProfilerStage.INPUT)
+
+    tree_view: list[TreeViewItem] = get_tree_view(ctx)
+    mark(profiler, ProfilerStage.TREE_VIEW)
+
+    # --- Viewport: only rows that fit on screen get formatted ---
+    row_count = len(tree_view)
+    if isinstance(ctx.state, DraftingNode):
+        focused_index = ctx.state.tree_view_index
+        row_count += 1  # ghost row
+    else:
+        focused_index = ctx.state.selected_view_item_index
+
+    viewport_height = ctx.screen.height
+    ctx.viewport_top = scroll_into_view(ctx.viewport_top, focused_index, viewport_height)
+    viewport_top = ctx.viewport_top
+    viewport_end = min(row_count, viewport_top + viewport_height)
+
+    # This injects the extra ghost draft node into the visible rows
     # before rendering, so that it doesn't physically exist
     if isinstance(ctx.state, DraftingNode):
-        depth: int = ctx.state.parent_view_item.depth + 1
-        tree_view.insert(
-            ctx.state.draft_node_index_in_tree_view,
-            TreeViewItem(Node(ctx.owned_runes[ctx.state.selected_owned_rune_index]), depth),
-        )
+        ghost_index = ctx.state.tree_view_index
+        depth: int = tree_view[ghost_index - 1].depth + 1
+        ghost_item = TreeViewItem(Node(ctx.owned_runes[ctx.state.selected_rune_index]), depth)
+        # The ghost is focused, so it always falls inside the viewport
+        visible_items = [
+            *tree_view[viewport_top:ghost_index],
+            ghost_item,
+            *tree_view[ghost_index : viewport_end - 1],
+        ]
+    else:
+        visible_items = tree_view[viewport_top:viewport_end]
 
     # --- View tree rendering---
-    for index, item in enumerate(tree_view):
-        text_segments: list[RichText] = []
+    for index, item in enumerate(visible_items, start=viewport_top):
+        x, y = 2 * item.depth, index - viewport_top
 
         item_is_selected: bool = (
             isinstance(ctx.state, NavigatingTree) and ctx.state.selected_view_item_index == index
         )
         item_is_ghost: bool = (
-            isinstance(ctx.state, DraftingNode) and ctx.state.draft_node_index_in_tree_view == index
+            isinstance(ctx.state, DraftingNode) and ctx.state.tree_view_index == index
         )
 
-        if item_is_selected:
-            # node label
-            text = item.node.rune.data.display_name
-            main_label_color = rune_rarity_color(item.node.rune.rarity)
-            text_segments.append(RichText(text, main_label_color))
-
-            # branch (current/max) display
-            current_branches: int = len(item.node.children)
-            max_branches: int = rune_rarity_max_branch_count(item.node.rune.rarity)
-            text_segments.append(
-                RichText(f" ({current_branches}/{max_branches})", main_label_color)
-            )
-
-            # stat display
-            stat_displays: list[str] = []
-            stat_points = item.node.rune.data.points
-            stat_mult = item.node.rune.data.mult
-
-            if stat_points >= 1:
-                stat_displays.append(f"+{stat_points} points")
-            if stat_mult >= 2:
-                stat_displays.append(f"+{stat_mult} mult")
-
-            desc_text: str = " ".join(stat_displays)
-            text_segments.append(RichText(f"  ({desc_text})", RGBA(1.0, 1.0, 1.0, 0.4)))
-        elif item_is_ghost:
+        if item_is_ghost:
+            # Laid out like a selected row, with the label and branch count pulsing
+            text_segments = format_row(item.node, RowMode.SELECTED)
             min_alpha: float = 0.3
             max_alpha: float = 1.0
-
-            # node label
-            text = item.node.rune.data.display_name
-            main_label_color = rune_rarity_color(item.node.rune.rarity)
-            main_label_color.a = 0.3 + (max_alpha - min_alpha) * (
+            pulse_alpha = min_alpha + (max_alpha - min_alpha) * (
                 math.sin(5.0 * ctx.tick_count * delta_time) * 0.5 + 0.5
             )
-            text_segments.append(RichText(text, main_label_color))
+            for segment in text_segments[:2]:
+                segment.color.a = pulse_alpha
 
-            # branch (current/max) display
-            current_branches = len(item.node.children)
-            max_branches = rune_rarity_max_branch_count(item.node.rune.rarity)
-            text_segments.append(
-                RichText(f" ({current_branches}/{max_branches})", main_label_color)
-            )
-
-            # stat display
-            stat_displays = []
-            stat_points = item.node.rune.data.points
-            stat_mult = item.node.rune.data.mult
+            print_at(x, y, text_segments)
+            continue
 
-            if stat_points >= 1:
-                stat_displays.append(f"+{stat_points} points")
-            if stat_mult >= 2:
-                stat_displays.append(f"+{stat_mult} mult")
+        # Static rows are styled once and copied in on later frames
+        row_mode = RowMode.SELECTED if item_is_selected else RowMode.NORMAL
+        row = get_cached_row(ctx, item.node, row_mode)
+        blit_at(ctx.screen, x, y, row)
 
-            desc_text = " ".join(stat_displays)
-            text_segments.append(RichText(f"  ({desc_text})", RGBA(1.0, 1.0, 1.0, 0.4)))
-        else:
-            text = item.node.rune.data.display_name
-            main_label_color = rune_rarity_color(item.node.rune.rarity)
-            main_label_color.a *= 0.5
-            text_segments.append(RichText(text, main_label_color))
-
-        print_at(2 * item.depth, index, text_segments)
+        if item_is_selected:
+            # subtree totals display, changes with any descendant so it is never cached
+            scores = get_tree_scores(ctx)
+            subtree_text = (
+                f"  [subtree: {scores.subtree_points[index]} points,"
+                f" {scores.subtree_mult[index]} mult, score {scores.score[index]:.0f}]"
+            )
+            print_at(x + len(row.cells), y, RichText(subtree_text, RGBA(1.0, 1.0, 1.0, 0.4)))
 
     # dev: state debug display
     print_at(1, 28, RichText(f"State: {ctx.state.__class__.__name__}"))
 
+    # Best placement for the current inventory, once the background ranking is done
+    if isinstance(ctx.state, DraftingNode) and ctx.draft_ranker is not None:
+        from branch_game.draft_evaluator import best_placement
+
+        best = best_placement(ctx)
+        if best is not None:
+            rune_name = ctx.owned_runes[best.rune_index].data.display_name
+            parent_name = tree_view[best.parent_view_index].node.rune.data.display_name
+            hint_text = f"Best draft: {rune_name} under {parent_name}, score {best.score:.0f}"
+            print_at(1, 27, RichText(hint_text, RGBA(1.0, 1.0, 1.0, 0.4)))
+
     # universal debug line
     print_at(1, 29, RichText(ctx.debug_line, RGBA(1.0, 0.0, 0.0, 1.0)))
 
@@ -415,21 +519,35 @@ def tick(
         fps_counter,
     )
 
-    flush_diffs(ctx.terminal, buffer_diff(ctx.screen))
+    # --- Frame profiler overlay ---
+    render_profiler_overlay(ctx.terminal, ctx.screen, profiler)
+    mark(profiler, ProfilerStage.FORMAT)
+
+    diffs = buffer_diff(ctx.screen)
+    mark(profiler, ProfilerStage.DIFF)
+
+    bytes_flushed = flush_diffs(ctx.terminal, diffs, ctx.output)
+    mark(profiler, ProfilerStage.FLUSH)
+    end_frame(profiler, bytes_flushed, len(diffs))
+
+    ctx.dirty = False
     return ProgramStatus.RUNNING
 
 
-def main() -> None:
-    terminal = Terminal()
-    screen = Screen(terminal.width, terminal.height)
-    print_at = partial(ezterm.print_at, terminal, screen)
+def create_context(
+    terminal: Terminal,
+    screen: AnyScreen,
+    keys: KeySource | None = None,
+    output: OutputSink | None = None,
+) -> Context:
     ctx = Context(
         terminal,
         screen,
         state=NavigatingTree(selected_view_item_index=0),
         node_tree=Node(Rune(RuneRarity.COMMON, RuneData(5, 1, "X Pik"))),
+        keys=keys,
+        output=output,
     )
-    fps_counter = FPSCounter()
 
     # TODO: remove this later
     # temp node tree rendering testing
@@ -453,19 +571,227 @@ def main() -> None:
         Rune(RuneRarity.COMMON, RuneData(3, 2, "Vek")),
     ]
 
-    fill_screen_background(terminal, screen, BACKGROUND_COLOR)
-    fps_limiter = create_fps_limiter(144)
+    return ctx
+
+
+def run_frame_loop(
+    ctx: Context,
+    print_at: PrintAtCallable,
+    fps_counter: FPSCounter,
+    fps_limiter: FPSLimiter,
+    recorder: RecordingKeySource | None = None,
+) -> None:
+    delta_time: float = 0.0
+
+    while True:
+        tick_outcome: ProgramStatus = tick(ctx, delta_time, print_at, fps_counter)
+        if recorder is not None:
+            write_frame(recorder, delta_time)
+        if tick_outcome == ProgramStatus.EXIT:
+            break
+
+        ctx.tick_count += 1
+        if needs_render(ctx):
+            delta_time = fps_limiter.wait_for_next_frame()
+        else:
+            # Idle: sleep until a key arrives instead of pacing empty frames
+            _ = wait_for_input(ctx, IDLE_INPUT_TIMEOUT)
+            # The wait was no frame, its length must not show up as the next frame's time
+            fps_limiter.resync()
 
-    with terminal.cbreak(), terminal.hidden_cursor(), terminal.fullscreen():
-        delta_time: float = 0.0
 
+async def run_event_loop(
+    ctx: Context,
+    key_source: QueueKeySource,
+    print_at: PrintAtCallable,
+    fps_counter: FPSCounter,
+    fps: float,
+    trace: FrameTrace | None = None,
+    recorder: RecordingKeySource | None = None,
+) -> None:
+    """
+    `run_frame_loop` as a coroutine. Keys are queued by the event loop between
+    frames, and the awaits leave room for timers and background tasks.
+    Frames are paced on absolute times like `create_fps_limiter`, at the
+    precision of the event loop's timer.
+    """
+    import asyncio
+
+    from branch_game.key_queue import start_key_reader, wait_for_keys
+
+    loop = asyncio.get_running_loop()
+    stop_key_reader = start_key_reader(ctx.terminal, key_source)
+    remove_resize_handler = install_loop_resize_handler(loop, ctx.resize, key_source.arrived)
+
+    target = 1.0 / fps
+    frame_start = loop.time()
+    next_frame = frame_start + target
+    delta_time: float = 0.0
+
+    try:
         while True:
             tick_outcome: ProgramStatus = tick(ctx, delta_time, print_at, fps_counter)
+            if recorder is not None:
+                write_frame(recorder, delta_time)
             if tick_outcome == ProgramStatus.EXIT:
                 break
 
             ctx.tick_count += 1
-            delta_time = fps_limiter()
+            if not needs_render(ctx):
+                _ = await wait_for_keys(key_source, IDLE_INPUT_TIMEOUT)
+                # Same as `FPSLimiter.resync`, the wait is not timed as a frame
+                frame_start = loop.time()
+                next_frame = frame_start + target
+                continue
+
+            target_time = next_frame
+            await asyncio.sleep(max(0.0, target_time - loop.time()))
+            end = loop.time()
+
+            delta_time = end - frame_start
+            frame_start = end
+            next_frame = target_time + target
+
+            # Late frames resync instead of bursting to catch up
+            resynced = end > next_frame
+            if resynced:
+                next_frame = end + target
+
+            if trace is not None:
+                record_frame(trace, end, delta_time, end - target_time, resynced)
+    finally:
+        stop_key_reader()
+        remove_resize_handler()
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m branch_game")
+    _ = parser.add_argument(
+        "--frame-trace",
+        metavar="PATH",
+        help="on exit, write frame timings as CSV (.csv) or Chrome trace-event JSON",
+    )
+    _ = parser.add_argument(
+        "--limiter",
+        choices=[strategy.name.lower() for strategy in LimiterStrategy],
+        default=LimiterStrategy.SPIN.name.lower(),
+        help="how to wait between frames; adaptive and sleep use much less CPU",
+    )
+    _ = parser.add_argument(
+        "--asyncio",
+        action="store_true",
+        help="run the frame loop on asyncio with a stdin reader (POSIX only, ignores --limiter)",
+    )
+    _ = parser.add_argument(
+        "--record",
+        metavar="PATH",
+        help="record keys and frame times for python -m branch_game.replay",
+    )
+    _ = parser.add_argument("--load", metavar="PATH", help="start from a saved tree and inventory")
+    _ = parser.add_argument("--save", metavar="PATH", help="save the tree and inventory on exit")
+    _ = parser.add_argument(
+        "--screen",
+        choices=["list", "array", "composite"],
+        default="list",
+        help="screen buffer backend; composite blends translucent colors and overlays",
+    )
+    _ = parser.add_argument(
+        "--colors",
+        choices=["auto", "truecolor", "256", "16", "8"],
+        default="auto",
+        help="color output mode, auto picks it from the terminal's reported colors",
+    )
+    args = parser.parse_args(argv)
+
+    terminal = Terminal()
+    screen: AnyScreen
+    if args.screen == "composite":
+        screen = CompositeScreen(terminal.width, terminal.height, terminal)
+    elif args.screen == "array":
+        screen = ArrayScreen(terminal.width, terminal.height)
+    else:
+        screen = Screen(terminal.width, terminal.height)
+    if args.colors == "auto":
+        screen.styles.color_depth = color_depth_for(terminal)
+    elif args.colors == "truecolor":
+        screen.styles.color_depth = ColorDepth.TRUECOLOR
+    else:
+        screen.styles.color_depth = ColorDepth(int(args.colors))
+    print_at = partial(ezterm.print_at, terminal, screen)
+    key_source: QueueKeySource | None = None
+    if args.asyncio:
+        from branch_game.key_queue import QueueKeySource
+
+        key_source = QueueKeySource()
+    recorder = (
+        start_recording(
+            args.record, key_source or terminal, terminal.width, terminal.height, args.load
+        )
+        if args.record
+        else None
+    )
+    ctx = create_context(terminal, screen, keys=recorder or key_source)
+    draft_ranker = DraftRanker()
+    ctx.draft_ranker = draft_ranker
+    if args.load:
+        from branch_game.save_format import load_into_context
+
+        load_into_context(ctx, args.load)
+    fps_counter = FPSCounter()
+
+    frame_trace = FrameTrace() if args.frame_trace else None
+
+    try:
+        with terminal.cbreak(), terminal.hidden_cursor(), terminal.fullscreen():
+            frame_writer = start_frame_writer(
+                sys.stdout.fileno(), synchronized=supports_synchronized_output(terminal)
+            )
+            ctx.output = frame_writer
+            # Painting the background through the terminal leaves the first frame
+            # to diff only what it draws, instead of every cell
+            _ = frame_writer.write(clear_to_background(terminal, BACKGROUND_COLOR))
+            try:
+                if key_source is not None:
+                    import asyncio
+
+                    asyncio.run(
+                        run_event_loop(
+                            ctx,
+                            key_source,
+                            print_at,
+                            fps_counter,
+                            TARGET_FPS,
+                            frame_trace,
+                            recorder,
+                        )
+                    )
+                else:
+                    remove_resize_handler = install_resize_handler(ctx.resize)
+                    try:
+                        fps_limiter = create_fps_limiter(
+                            TARGET_FPS,
+                            trace=frame_trace,
+                            strategy=LimiterStrategy[args.limiter.upper()],
+                        )
+                        run_frame_loop(ctx, print_at, fps_counter, fps_limiter, recorder)
+                    finally:
+                        remove_resize_handler()
+            finally:
+                # Frames still in flight must land before fullscreen is left
+                stop_frame_writer(frame_writer)
+    finally:
+        if frame_trace is not None:
+            export_trace(frame_trace, args.frame_trace)
+        if recorder is not None:
+            stop_recording(recorder)
+        if draft_ranker.background is not None:
+            from branch_game.draft_evaluator import stop_draft_ranker
+
+            stop_draft_ranker(draft_ranker)
+        if args.save:
+            from branch_game.save_format import save_context
+
+            save_context(args.save, ctx)
 
 
 if __name__ == "__main__":
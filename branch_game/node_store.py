@@ -0,0 +1,428 @@
+from __future__ import annotations
+
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import cast, overload
+
+import numpy as np
+from numpy.typing import NDArray
+
+from branch_game.data_types import Node, Rune, RuneData, RuneRarity, TreeViewItem
+
+NO_NODE = -1
+ROOT_NODE = 0
+
+_ARRAY_FIELDS = (
+    "parent",
+    "first_child",
+    "next_sibling",
+    "rarity",
+    "points",
+    "mult",
+    "name_id",
+    "version",
+)
+
+
+def _empty(dtype: type[np.generic]) -> NDArray[np.generic]:
+    return np.empty(0, dtype=dtype)
+
+
+@dataclass
+class NodeStore:
+    """
+    Struct-of-arrays rune tree. Node `i` is described by index `i` of every
+    array, siblings form a linked list through `first_child`/`next_sibling`.
+    Costs 29 bytes per node plus one entry per distinct display name.
+    """
+
+    size: int = 0
+    parent: NDArray[np.int32] = field(default_factory=lambda: _empty(np.int32))
+    first_child: NDArray[np.int32] = field(default_factory=lambda: _empty(np.int32))
+    next_sibling: NDArray[np.int32] = field(default_factory=lambda: _empty(np.int32))
+    rarity: NDArray[np.uint8] = field(default_factory=lambda: _empty(np.uint8))
+    points: NDArray[np.int32] = field(default_factory=lambda: _empty(np.int32))
+    mult: NDArray[np.int32] = field(default_factory=lambda: _empty(np.int32))
+    name_id: NDArray[np.int32] = field(default_factory=lambda: _empty(np.int32))
+    # `Node.version` of every node, not saved
+    version: NDArray[np.int32] = field(default_factory=lambda: _empty(np.int32))
+    names: list[str] = field(default_factory=list[str])
+    name_ids: dict[str, int] = field(default_factory=dict[str, int])
+
+
+def create_node_store(capacity: int = 1024) -> NodeStore:
+    store = NodeStore()
+    _reserve(store, capacity)
+    return store
+
+
+def _reserve(store: NodeStore, capacity: int) -> None:
+    current = len(store.parent)
+    if capacity <= current:
+        return
+
+    new_capacity = max(capacity, current * 2)
+    for name in _ARRAY_FIELDS:
+        old: NDArray[np.generic] = getattr(store, name)
+        grown = np.empty(new_capacity, dtype=old.dtype)
+        grown[: store.size] = old[: store.size]
+        setattr(store, name, grown)
+
+
+def intern_name(store: NodeStore, name: str) -> int:
+    name_id = store.name_ids.get(name)
+    if name_id is None:
+        name_id = len(store.names)
+        store.names.append(name)
+        store.name_ids[name] = name_id
+    return name_id
+
+
+def add_node(store: NodeStore, rune: Rune) -> int:
+    """Appends a detached node and returns its index."""
+    _reserve(store, store.size + 1)
+    index = store.size
+    store.parent[index] = NO_NODE
+    store.first_child[index] = NO_NODE
+    store.next_sibling[index] = NO_NODE
+    store.rarity[index] = rune.rarity.value
+    store.points[index] = rune.data.points
+    store.mult[index] = rune.data.mult
+    store.name_id[index] = intern_name(store, rune.data.display_name)
+    store.version[index] = 0
+    store.size += 1
+    return index
+
+
+def attach_child(store: NodeStore, parent: int, index: int, child: int) -> None:
+    """Links detached `child` in as the `index`-th child of `parent`."""
+    store.parent[child] = parent
+
+    if index == 0 or store.first_child[parent] == NO_NODE:
+        store.next_sibling[child] = store.first_child[parent]
+        store.first_child[parent] = child
+        return
+
+    previous = int(store.first_child[parent])
+    for _ in range(index - 1):
+        following = int(store.next_sibling[previous])
+        if following == NO_NODE:
+            break
+        previous = following
+
+    store.next_sibling[child] = store.next_sibling[previous]
+    store.next_sibling[previous] = child
+
+
+def iter_children(store: NodeStore, index: int) -> Iterator[int]:
+    child = int(store.first_child[index])
+    while child != NO_NODE:
+        yield child
+        child = int(store.next_sibling[child])
+
+
+def node_rune(store: NodeStore, index: int) -> Rune:
+    return Rune(
+        RuneRarity(int(store.rarity[index])),
+        RuneData(
+            int(store.points[index]),
+            int(store.mult[index]),
+            store.names[store.name_id[index]],
+        ),
+    )
+
+
+def _preorder(store: NodeStore, index: int, depth: int) -> tuple[list[int], list[int]]:
+    """Depth-first node order and depths below `index`, walking the sibling links as plain ints."""
+    first_child: list[int] = store.first_child[: store.size].tolist()
+    next_sibling: list[int] = store.next_sibling[: store.size].tolist()
+
+    order: list[int] = []
+    depths: list[int] = []
+    stack: list[tuple[int, int]] = [(index, depth)]
+    while stack:
+        current, current_depth = stack.pop()
+        order.append(current)
+        depths.append(current_depth)
+
+        children: list[int] = []
+        child = first_child[current]
+        while child != NO_NODE:
+            children.append(child)
+            child = next_sibling[child]
+        stack.extend((child, current_depth + 1) for child in reversed(children))
+
+    return order, depths
+
+
+def flatten_store(store: NodeStore, index: int = ROOT_NODE, depth: int = 0) -> StoreTreeView:
+    """`flatten_subtree` for store nodes, without creating an item per row up front."""
+    order, depths = _preorder(store, index, depth)
+    return StoreTreeView(store, np.array(order, dtype=np.int32), np.array(depths, dtype=np.int32))
+
+
+def preorder_store(store: NodeStore) -> tuple[NodeStore, NDArray[np.int32]]:
+    """
+    Compacted copy of the tree under the root, renumbered in depth-first order,
+    and the depth of every node. Unreachable nodes are dropped.
+    """
+    order_list, depths = _preorder(store, ROOT_NODE, 0)
+    order = np.array(order_list, dtype=np.int32)
+    size = len(order)
+
+    new_index = np.full(store.size, NO_NODE, dtype=np.int32)
+    new_index[order] = np.arange(size, dtype=np.int32)
+
+    def renumber(links: NDArray[np.int32]) -> NDArray[np.int32]:
+        old = links[order]
+        return np.where(old == NO_NODE, NO_NODE, new_index[old]).astype(np.int32)
+
+    reordered = NodeStore(
+        size=size,
+        parent=renumber(store.parent),
+        first_child=renumber(store.first_child),
+        next_sibling=renumber(store.next_sibling),
+        rarity=store.rarity[order],
+        points=store.points[order],
+        mult=store.mult[order],
+        name_id=store.name_id[order],
+        version=store.version[order],
+        names=list(store.names),
+        name_ids=dict(store.name_ids),
+    )
+    return reordered, np.array(depths, dtype=np.int32)
+
+
+def node_store_from_tree(root: Node) -> NodeStore:
+    """Copies a `Node` tree into a store, in depth-first order with the root at index 0."""
+    store = create_node_store()
+    stack: list[tuple[Node, int]] = [(root, NO_NODE)]
+
+    while stack:
+        node, parent = stack.pop()
+        index = add_node(store, node.rune)
+        if parent != NO_NODE:
+            store.parent[index] = parent
+        # Children are linked front-to-back once all of them have indices
+        stack.extend((child, index) for child in reversed(node.children))
+
+    _link_siblings(store)
+    return store
+
+
+def _link_siblings(store: NodeStore) -> None:
+    """Rebuilds `first_child`/`next_sibling` from `parent`, ordering siblings by index."""
+    parent = store.parent[: store.size]
+    children = np.flatnonzero(parent != NO_NODE).astype(np.int32)
+    # Stable sort keeps siblings in index order within each parent
+    children = children[np.argsort(parent[children], kind="stable")]
+    child_parents = parent[children]
+
+    store.first_child[: store.size] = NO_NODE
+    store.next_sibling[: store.size] = NO_NODE
+    if len(children) == 0:
+        return
+
+    is_first = np.ones(len(children), dtype=bool)
+    is_first[1:] = child_parents[1:] != child_parents[:-1]
+    store.first_child[child_parents[is_first]] = children[is_first]
+
+    has_next = np.zeros(len(children), dtype=bool)
+    has_next[:-1] = ~is_first[1:]
+    store.next_sibling[children[has_next]] = children[1:][has_next[:-1]]
+
+
+@dataclass(unsafe_hash=True)
+class StoreNode:
+    """`Node`-shaped view of one store entry, for `generate_tree_view` and `insert_child`."""
+
+    store: NodeStore = field(compare=False, hash=False, repr=False)
+    index: int
+
+    @property
+    def rune(self) -> Rune:
+        return node_rune(self.store, self.index)
+
+    @property
+    def children(self) -> StoreChildren:
+        return StoreChildren(self.store, self.index)
+
+    @property
+    def parent(self) -> StoreNode | None:
+        parent = int(self.store.parent[self.index])
+        return None if parent == NO_NODE else StoreNode(self.store, parent)
+
+    @parent.setter
+    def parent(self, value: StoreNode | None) -> None:
+        self.store.parent[self.index] = NO_NODE if value is None else value.index
+
+    @property
+    def version(self) -> int:
+        return int(self.store.version[self.index])
+
+    @version.setter
+    def version(self, value: int) -> None:
+        self.store.version[self.index] = value
+
+
+@dataclass
+class StoreChildren:
+    """List-like view over a store node's children."""
+
+    store: NodeStore = field(repr=False)
+    index: int
+
+    def __iter__(self) -> Iterator[StoreNode]:
+        for child in iter_children(self.store, self.index):
+            yield StoreNode(self.store, child)
+
+    def __reversed__(self) -> Iterator[StoreNode]:
+        return reversed(list(self))
+
+    def __len__(self) -> int:
+        return sum(1 for _ in iter_children(self.store, self.index))
+
+    def __getitem__(self, position: int) -> StoreNode:
+        return list(self)[position]
+
+    def insert(self, position: int, child: StoreNode) -> None:
+        attach_child(self.store, self.index, position, child.index)
+
+    def append(self, child: StoreNode) -> None:
+        self.insert(len(self), child)
+
+
+def new_store_node(store: NodeStore, rune: Rune) -> StoreNode:
+    return StoreNode(store, add_node(store, rune))
+
+
+@dataclass
+class StoreTreeView:
+    """
+    Tree view rows as arrays of node indices and depths; `TreeViewItem`s are
+    only created for the rows that get read. Supports the list operations the
+    game uses on tree views, inserting rows included.
+    """
+
+    store: NodeStore = field(repr=False)
+    nodes: NDArray[np.int32]
+    depths: NDArray[np.int32]
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @overload
+    def __getitem__(self, position: int) -> TreeViewItem: ...
+
+    @overload
+    def __getitem__(self, position: slice) -> list[TreeViewItem]: ...
+
+    def __getitem__(self, position: int | slice) -> TreeViewItem | list[TreeViewItem]:
+        if isinstance(position, slice):
+            nodes: list[int] = self.nodes[position].tolist()
+            depths: list[int] = self.depths[position].tolist()
+            return [self._item(node, depth) for node, depth in zip(nodes, depths)]
+        return self._item(int(self.nodes[position]), int(self.depths[position]))
+
+    def __iter__(self) -> Iterator[TreeViewItem]:
+        return iter(self[:])
+
+    def __setitem__(self, position: slice, items: list[TreeViewItem]) -> None:
+        start, stop, _ = position.indices(len(self))
+        if start != stop:
+            raise TypeError("StoreTreeView only supports inserting rows")
+
+        indices = [cast(StoreNode, item.node).index for item in items]
+        self.nodes = np.insert(self.nodes, start, np.array(indices, dtype=np.int32))
+        self.depths = np.insert(self.depths, start, [item.depth for item in items])
+
+    def _item(self, node: int, depth: int) -> TreeViewItem:
+        return TreeViewItem(cast(Node, StoreNode(self.store, node)), depth)
+
+
+# Store nodes and views stand in for `Node`s and tree view lists, the rest of
+# the game only tells them apart through the functions below
+
+
+def _as_store_node(node: Node) -> StoreNode | None:
+    store_node = cast(Node | StoreNode, node)
+    return store_node if isinstance(store_node, StoreNode) else None
+
+
+def _as_store_view(items: list[TreeViewItem]) -> StoreTreeView | None:
+    view = cast(list[TreeViewItem] | StoreTreeView, items)
+    return view if isinstance(view, StoreTreeView) else None
+
+
+def store_root(store: NodeStore) -> Node:
+    """The root of `store`, to be used wherever the game expects a `Node`."""
+    return cast(Node, StoreNode(store, ROOT_NODE))
+
+
+def node_store_of(root: Node) -> NodeStore:
+    """The store backing the tree under `root`, copying `Node` trees into a new one."""
+    store_node = _as_store_node(root)
+    if store_node is not None and store_node.index == ROOT_NODE:
+        return store_node.store
+    return node_store_from_tree(root)
+
+
+def create_child_node(parent: Node, rune: Rune) -> Node:
+    """A detached node of the same kind as `parent`, ready for `insert_child`."""
+    store_node = _as_store_node(parent)
+    if store_node is not None:
+        return cast(Node, new_store_node(store_node.store, rune))
+    return Node(rune)
+
+
+def node_key(node: Node) -> tuple[int, int, int]:
+    """Identity and version of `node`, the same for every `StoreNode` of one store entry."""
+    store_node = _as_store_node(node)
+    if store_node is not None:
+        return id(store_node.store), store_node.index, store_node.version
+    return id(node), NO_NODE, node.version
+
+
+def flatten_store_tree(root: Node) -> list[TreeViewItem] | None:
+    """The tree view under a store node as a `StoreTreeView`, None for `Node` trees."""
+    store_node = _as_store_node(root)
+    if store_node is None:
+        return None
+    return cast(list[TreeViewItem], flatten_store(store_node.store, store_node.index))
+
+
+def copy_tree_view(items: list[TreeViewItem]) -> list[TreeViewItem]:
+    """A copy of the rows that inserting into `items` leaves as it is."""
+    view = _as_store_view(items)
+    if view is not None:
+        # Inserting rows replaces `nodes` and `depths`, it never writes into them
+        return cast(list[TreeViewItem], StoreTreeView(view.store, view.nodes, view.depths))
+    return list(items)
+
+
+def view_depths(items: list[TreeViewItem]) -> NDArray[np.int64]:
+    view = _as_store_view(items)
+    if view is not None:
+        return view.depths.astype(np.int64)
+    return np.fromiter((item.depth for item in items), np.int64, len(items))
+
+
+def view_points(items: list[TreeViewItem]) -> NDArray[np.int64]:
+    view = _as_store_view(items)
+    if view is not None:
+        return view.store.points[view.nodes].astype(np.int64)
+    return np.fromiter((item.node.rune.data.points for item in items), np.int64, len(items))
+
+
+def view_mult(items: list[TreeViewItem]) -> NDArray[np.int64]:
+    view = _as_store_view(items)
+    if view is not None:
+        return view.store.mult[view.nodes].astype(np.int64)
+    return np.fromiter((item.node.rune.data.mult for item in items), np.int64, len(items))
+
+
+def view_rarities(items: list[TreeViewItem]) -> NDArray[np.int64]:
+    view = _as_store_view(items)
+    if view is not None:
+        return view.store.rarity[view.nodes].astype(np.int64)
+    return np.fromiter((item.node.rune.rarity.value for item in items), np.int64, len(items))
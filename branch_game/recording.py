@@ -0,0 +1,137 @@
+"""
+Compact binary input recordings, replayed by `branch_game.replay`.
+
+Layout, little-endian: a header (magic, format version, screen width and height,
+SHA-256 of the save file the session was loaded from or zeros), then one record
+per tick: `delta_time` as float64, a key count, and for each key its code
+(-1 for plain characters) followed by its UTF-8 sequence and name.
+"""
+
+import struct
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from typing import BinaryIO
+
+from blessed.keyboard import Keystroke
+
+from branch_game.data_types import KeySource
+
+MAGIC = b"BGRC"
+FORMAT_VERSION = 2
+
+_HEADER = struct.Struct("<4sHHH32s")
+_FRAME = struct.Struct("<dH")
+_KEY = struct.Struct("<iBB")
+NO_KEY_CODE = -1
+# Save digest of a session started from the default tree
+NO_SAVE_DIGEST = bytes(32)
+
+
+class RecordingFormatError(ValueError):
+    pass
+
+
+@dataclass
+class RecordedFrame:
+    delta_time: float
+    keys: list[Keystroke] = field(default_factory=list[Keystroke])
+
+
+@dataclass
+class RecordingKeySource:
+    """Passes keys through from `inner`, keeping the ones read during the current tick."""
+
+    inner: KeySource
+    file: BinaryIO
+    frame_count: int = 0
+    _frame_keys: list[Keystroke] = field(default_factory=list[Keystroke], repr=False)
+
+    def inkey(self, timeout: float | None = None) -> Keystroke:
+        key = self.inner.inkey(timeout=timeout)
+        if key:
+            self._frame_keys.append(key)
+        return key
+
+    def kbhit(self, timeout: float | None = None) -> bool:
+        return self.inner.kbhit(timeout=timeout)
+
+
+def save_digest(save_path: str | None) -> bytes:
+    """Identifies the save a session starts from, so it is only replayed against the same tree."""
+    if save_path is None:
+        return NO_SAVE_DIGEST
+
+    import hashlib
+
+    with open(save_path, "rb") as file:
+        return hashlib.file_digest(file, "sha256").digest()
+
+
+def start_recording(
+    path: str, inner: KeySource, width: int, height: int, save_path: str | None = None
+) -> RecordingKeySource:
+    """`save_path` is the save loaded before the first tick, if any."""
+    digest = save_digest(save_path)
+    file = open(path, "wb")
+    _ = file.write(_HEADER.pack(MAGIC, FORMAT_VERSION, width, height, digest))
+    return RecordingKeySource(inner, file)
+
+
+def write_frame(recorder: RecordingKeySource, delta_time: float) -> None:
+    """Ends the current tick's record, call once after every `tick`."""
+    file = recorder.file
+    frame_keys = recorder._frame_keys  # pyright:ignore[reportPrivateUsage]
+    _ = file.write(_FRAME.pack(delta_time, len(frame_keys)))
+
+    for key in frame_keys:
+        sequence = str(key).encode("utf-8")
+        name = (key.name or "").encode("ascii")
+        code = key.code if key.code is not None else NO_KEY_CODE
+        _ = file.write(_KEY.pack(code, len(sequence), len(name)))
+        _ = file.write(sequence)
+        _ = file.write(name)
+
+    frame_keys.clear()
+    recorder.frame_count += 1
+
+
+def stop_recording(recorder: RecordingKeySource) -> None:
+    recorder.file.close()
+
+
+def read_recording(file: BinaryIO) -> tuple[int, int, bytes, Iterator[RecordedFrame]]:
+    """
+    Screen width and height the session ran at, the `save_digest` of the save it
+    was loaded from, and its frames in order.
+    """
+    header = file.read(_HEADER.size)
+    if len(header) < _HEADER.size:
+        raise RecordingFormatError("truncated header")
+    magic, version, width, height, digest = _HEADER.unpack(header)
+    if magic != MAGIC:
+        raise RecordingFormatError("not an input recording")
+    if version != FORMAT_VERSION:
+        raise RecordingFormatError(f"unsupported recording version {version}")
+
+    return width, height, digest, _read_frames(file)
+
+
+def _read_frames(file: BinaryIO) -> Iterator[RecordedFrame]:
+    while frame_header := file.read(_FRAME.size):
+        # A session killed mid-write leaves a partial last record
+        if len(frame_header) < _FRAME.size:
+            return
+        delta_time, key_count = _FRAME.unpack(frame_header)
+
+        frame = RecordedFrame(delta_time)
+        for _ in range(key_count):
+            key_header = file.read(_KEY.size)
+            if len(key_header) < _KEY.size:
+                return
+            code, sequence_size, name_size = _KEY.unpack(key_header)
+            sequence = file.read(sequence_size).decode("utf-8")
+            name = file.read(name_size).decode("ascii")
+            frame.keys.append(
+                Keystroke(sequence, None if code == NO_KEY_CODE else code, name or None)
+            )
+        yield frame
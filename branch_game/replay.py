@@ -0,0 +1,134 @@
+"""
+Replays an input recording through `tick` headless, as a repeatable load test.
+
+    python -m branch_game --record session.bgrc
+    python -m branch_game.replay session.bgrc
+    python -m branch_game.replay session.bgrc --realtime
+    python -m branch_game --load big.bgsv --record session.bgrc
+    python -m branch_game.replay session.bgrc --load big.bgsv
+
+A session started from a save only replays against that same save.
+"""
+
+import argparse
+import statistics
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from functools import partial
+
+import branch_game.ezterm as ezterm
+from branch_game.data_types import Context, FPSCounter
+from branch_game.headless import MemorySink, ScriptedKeySource, create_headless_context
+from branch_game.main import ProgramStatus, needs_render, tick
+from branch_game.recording import (
+    NO_SAVE_DIGEST,
+    RecordedFrame,
+    RecordingFormatError,
+    read_recording,
+    save_digest,
+)
+
+
+@dataclass
+class ReplayStats:
+    frames: int = 0
+    # Ticks that drew a frame rather than returning early while idle
+    rendered_frames: int = 0
+    total_seconds: float = 0.0
+    tick_ns: list[int] = field(default_factory=list[int])
+
+
+def replay(ctx: Context, frames: Iterable[RecordedFrame], realtime: bool = False) -> ReplayStats:
+    """
+    Feeds every recorded frame's keys and `delta_time` through `tick`.
+    Runs back to back unless `realtime`, which waits out each `delta_time`.
+    """
+    key_source = ScriptedKeySource()
+    ctx.keys = key_source
+    print_at = partial(ezterm.print_at, ctx.terminal, ctx.screen)
+    fps_counter = FPSCounter()
+    stats = ReplayStats()
+
+    start = time.perf_counter()
+    due = start
+    for frame in frames:
+        if realtime:
+            due += frame.delta_time
+            time.sleep(max(0.0, due - time.perf_counter()))
+
+        key_source.keys.extend(frame.keys)
+        stats.rendered_frames += bool(frame.keys) or needs_render(ctx)
+
+        tick_start = time.perf_counter_ns()
+        status = tick(ctx, frame.delta_time, print_at, fps_counter)
+        stats.tick_ns.append(time.perf_counter_ns() - tick_start)
+
+        stats.frames += 1
+        if status == ProgramStatus.EXIT:
+            break
+        ctx.tick_count += 1
+
+    stats.total_seconds = time.perf_counter() - start
+    return stats
+
+
+def format_replay_stats(stats: ReplayStats) -> str:
+    if not stats.tick_ns:
+        return "empty recording"
+
+    ordered = sorted(stats.tick_ns)
+
+    def percentile(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))] / 1e3
+
+    return "\n".join(
+        [
+            f"frames        {stats.frames} ({stats.rendered_frames} rendered)",
+            f"total         {stats.total_seconds:.3f} s",
+            f"tick mean     {statistics.fmean(ordered) / 1e3:.1f} us",
+            f"tick p50      {percentile(0.50):.1f} us",
+            f"tick p95      {percentile(0.95):.1f} us",
+            f"tick p99      {percentile(0.99):.1f} us",
+            f"tick max      {ordered[-1] / 1e3:.1f} us",
+        ]
+    )
+
+
+def main(argv: list[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="python -m branch_game.replay")
+    _ = parser.add_argument("recording", help="file written by --record")
+    _ = parser.add_argument(
+        "--realtime", action="store_true", help="pace frames by their recorded delta_time"
+    )
+    _ = parser.add_argument(
+        "--load", metavar="PATH", help="save file the session was started from with --load"
+    )
+    args = parser.parse_args(argv)
+
+    with open(args.recording, "rb") as file:
+        try:
+            width, height, recorded_digest, frames = read_recording(file)
+        except RecordingFormatError as error:
+            parser.error(f"{args.recording}: {error}")
+        if save_digest(args.load) != recorded_digest:
+            if recorded_digest == NO_SAVE_DIGEST:
+                parser.error("the session started from the default tree, replay it without --load")
+            if args.load is None:
+                parser.error("the session started from a save file, pass it with --load")
+            parser.error(f"{args.load} is not the save file the session started from")
+
+        ctx = create_headless_context(width, height)
+        if args.load:
+            from branch_game.save_format import load_into_context
+
+            load_into_context(ctx, args.load)
+        stats = replay(ctx, frames, realtime=args.realtime)
+
+    print(format_replay_stats(stats))
+    if isinstance(ctx.output, MemorySink):
+        print(f"output        {ctx.output.bytes_written} bytes")
+
+
+if __name__ == "__main__":
+    main()
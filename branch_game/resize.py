@@ -0,0 +1,127 @@
+from __future__ import annotations
+
+import os
+import select
+import signal
+import sys
+import time
+from collections.abc import Callable
+from types import FrameType
+from typing import TYPE_CHECKING
+
+from blessed import Terminal
+
+from branch_game.data_types import Context, ResizeState
+from branch_game.screen_buffer import resize_screen
+
+if TYPE_CHECKING:
+    import asyncio
+
+# A resize is applied once no further events arrived for this long,
+# so dragging a window edge costs one full repaint instead of dozens
+RESIZE_SETTLE_SECONDS = 0.05
+
+
+def request_resize(resize: ResizeState) -> None:
+    resize.last_event = time.monotonic()
+
+
+def install_resize_handler(resize: ResizeState) -> Callable[[], None]:
+    """
+    Records SIGWINCH into `resize`, or turns on size polling where there is none.
+    Call from the main thread; see `wait_for_key_or_resize` for waking idle waits.
+    Returns a function that uninstalls it.
+    """
+    if not hasattr(signal, "SIGWINCH"):
+        resize.poll = True
+        return lambda: None
+
+    def on_sigwinch(signum: int, frame: FrameType | None) -> None:
+        request_resize(resize)
+
+    previous_handler = signal.signal(signal.SIGWINCH, on_sigwinch)
+
+    # Python retries a `select` interrupted by a signal once its handler ran,
+    # only a byte on a file descriptor it watches ends the wait early
+    read_fd, write_fd = os.pipe()
+    os.set_blocking(read_fd, False)
+    os.set_blocking(write_fd, False)
+    previous_wakeup_fd = signal.set_wakeup_fd(write_fd, warn_on_full_buffer=False)
+    resize.wakeup_fd = read_fd
+
+    def uninstall() -> None:
+        _ = signal.set_wakeup_fd(previous_wakeup_fd)
+        _ = signal.signal(signal.SIGWINCH, previous_handler)
+        resize.wakeup_fd = None
+        os.close(read_fd)
+        os.close(write_fd)
+
+    return uninstall
+
+
+def wait_for_key_or_resize(terminal: Terminal, resize: ResizeState, timeout: float) -> bool:
+    """
+    `terminal.kbhit` that also returns (False) as soon as a signal arrives,
+    for resize handlers installed by `install_resize_handler`.
+    """
+    if resize.wakeup_fd is None:
+        return terminal.kbhit(timeout=timeout)
+
+    keyboard_fd: int | None = terminal._keyboard_fd  # pyright:ignore[reportPrivateUsage]
+    watched = [resize.wakeup_fd] if keyboard_fd is None else [keyboard_fd, resize.wakeup_fd]
+    ready, _, _ = select.select(watched, [], [], timeout)
+
+    if resize.wakeup_fd in ready:
+        try:
+            while os.read(resize.wakeup_fd, 512):
+                pass
+        except BlockingIOError:
+            pass  # Drained
+    return keyboard_fd is not None and keyboard_fd in ready
+
+
+def install_loop_resize_handler(
+    loop: asyncio.AbstractEventLoop, resize: ResizeState, wake: asyncio.Event
+) -> Callable[[], None]:
+    """
+    `install_resize_handler` for an asyncio loop, also setting `wake` so an idle
+    loop notices. Returns a function that uninstalls it.
+    """
+    if not hasattr(signal, "SIGWINCH"):
+        resize.poll = True
+        return lambda: None
+
+    def on_sigwinch() -> None:
+        request_resize(resize)
+        wake.set()
+
+    loop.add_signal_handler(signal.SIGWINCH, on_sigwinch)
+
+    def uninstall() -> None:
+        _ = loop.remove_signal_handler(signal.SIGWINCH)
+
+    return uninstall
+
+
+def resize_pending(ctx: Context) -> bool:
+    resize = ctx.resize
+    if resize.poll and resize.last_event is None:
+        size = (ctx.terminal.width, ctx.terminal.height)
+        if size != (ctx.screen.width, ctx.screen.height):
+            request_resize(resize)
+    return resize.last_event is not None
+
+
+def apply_pending_resize(ctx: Context) -> bool:
+    """Resizes the screen to the terminal once resize events settled, returns whether it did."""
+    last_event = ctx.resize.last_event
+    if last_event is None or time.monotonic() - last_event < RESIZE_SETTLE_SECONDS:
+        return False
+
+    ctx.resize.last_event = None
+    resize_screen(ctx.screen, ctx.terminal.width, ctx.terminal.height)
+    # Wipes whatever the terminal reflowed; the invalidated old buffer repaints every cell
+    sink = ctx.output if ctx.output is not None else sys.stdout
+    _ = sink.write(ctx.terminal.clear)
+    ctx.dirty = True
+    return True
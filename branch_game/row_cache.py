@@ -0,0 +1,56 @@
+from branch_game.data import rune_rarity_color, rune_rarity_max_branch_count
+from branch_game.data_types import Context, Node, RowMode
+from branch_game.ezterm import RGBA, RichText, prerender
+from branch_game.node_store import node_key
+from branch_game.screen_buffer import CellRun
+
+
+def format_row(node: Node, mode: RowMode) -> list[RichText]:
+    text = node.rune.data.display_name
+    main_label_color = rune_rarity_color(node.rune.rarity)
+
+    if mode == RowMode.NORMAL:
+        main_label_color.a *= 0.5
+        return [RichText(text, main_label_color)]
+
+    # node label
+    text_segments = [RichText(text, main_label_color)]
+
+    # branch (current/max) display
+    current_branches: int = len(node.children)
+    max_branches: int = rune_rarity_max_branch_count(node.rune.rarity)
+    text_segments.append(RichText(f" ({current_branches}/{max_branches})", main_label_color))
+
+    # stat display
+    stat_displays: list[str] = []
+    stat_points = node.rune.data.points
+    stat_mult = node.rune.data.mult
+
+    if stat_points >= 1:
+        stat_displays.append(f"+{stat_points} points")
+    if stat_mult >= 2:
+        stat_displays.append(f"+{stat_mult} mult")
+
+    desc_text: str = " ".join(stat_displays)
+    text_segments.append(RichText(f"  ({desc_text})", RGBA(1.0, 1.0, 1.0, 0.4)))
+    return text_segments
+
+
+def get_cached_row(ctx: Context, node: Node, mode: RowMode) -> CellRun:
+    """Returns `node`'s prerendered row, formatting it only when the node changed."""
+    cache = ctx.row_cache
+    styles = ctx.screen.styles
+    if cache.evictions != styles.evictions or len(cache.rows) >= cache.capacity:
+        cache.rows.clear()
+        cache.evictions = styles.evictions
+
+    key = (*node_key(node), mode)
+
+    cached = cache.rows.get(key)
+    if cached is not None:
+        return cached[1]
+
+    run = prerender(ctx.terminal, ctx.screen, format_row(node, mode))
+    # Keeps the node alive, so its id is not reused while the row is cached
+    cache.rows[key] = (node, run)
+    return run
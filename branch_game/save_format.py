@@ -0,0 +1,207 @@
+"""
+Versioned binary saves of the rune tree and inventory.
+
+Little-endian, every section starting on an 8 byte boundary:
+
+    header       magic, format version, node/rune/name counts, name blob size
+    nodes        `NodeStore` arrays in depth-first order: parent, first_child,
+                 next_sibling, points, mult, name_id, depth as int32,
+                 then rarity as uint8
+    owned runes  points, mult, name_id as int32, then rarity as uint8
+    names        uint32 offsets (name count + 1) into a UTF-8 blob
+
+Loading maps the file copy-on-write, so opening a save costs the same for any
+tree size and edits never reach the file. Node order doubles as the tree view.
+Saving writes `<path>.tmp` and then replaces the save with it.
+"""
+
+import os
+import struct
+from dataclasses import dataclass
+from typing import BinaryIO, cast
+
+import numpy as np
+from numpy.typing import NDArray
+
+from branch_game.data_types import (
+    Context,
+    NavigatingTree,
+    Rune,
+    RuneData,
+    RuneRarity,
+    TreeView,
+    TreeViewItem,
+)
+from branch_game.node_store import (
+    NodeStore,
+    StoreTreeView,
+    node_store_of,
+    preorder_store,
+    store_root,
+)
+
+MAGIC = b"BGSV"
+FORMAT_VERSION = 1
+
+_HEADER = struct.Struct("<4sH2xQQQQ")
+_ALIGNMENT = 8
+_NODE_INT_FIELDS = ("parent", "first_child", "next_sibling", "points", "mult", "name_id")
+
+_INT32 = np.dtype("<i4")
+_UINT32 = np.dtype("<u4")
+_UINT8 = np.dtype("u1")
+
+
+class SaveFormatError(ValueError):
+    pass
+
+
+@dataclass
+class SaveGame:
+    store: NodeStore
+    owned_runes: list[Rune]
+    # The tree view of `store`, nodes are saved in depth-first order
+    tree_view: StoreTreeView
+
+
+def _write_section(file: BinaryIO, data: bytes) -> None:
+    _ = file.write(data)
+    _ = file.write(bytes(-len(data) % _ALIGNMENT))
+
+
+def _copy_out_of_file(store: NodeStore, path: str) -> None:
+    """Moves `store` arrays mapped from `path` into memory, which closes the mapping."""
+    target = os.path.abspath(path)
+    for name in (*_NODE_INT_FIELDS, "rarity"):
+        array: NDArray[np.generic] = getattr(store, name)
+        if isinstance(array, np.memmap) and array.filename == target:
+            setattr(store, name, np.array(array))
+
+
+def save_game(path: str, store: NodeStore, owned_runes: list[Rune]) -> None:
+    """Saving over the file `store` was loaded from first copies the store into memory."""
+    # Windows refuses to replace a file while part of it is mapped
+    _copy_out_of_file(store, path)
+    store, depths = preorder_store(store)
+    size = store.size
+    names = list(store.names)
+    name_ids = dict(store.name_ids)
+
+    rune_name_ids: list[int] = []
+    for rune in owned_runes:
+        name = rune.data.display_name
+        if name not in name_ids:
+            name_ids[name] = len(names)
+            names.append(name)
+        rune_name_ids.append(name_ids[name])
+
+    encoded_names = [name.encode("utf-8") for name in names]
+    name_offsets = np.zeros(len(names) + 1, dtype=_UINT32)
+    name_offsets[1:] = np.cumsum([len(name) for name in encoded_names])
+    name_blob = b"".join(encoded_names)
+
+    # A crash mid-write leaves the old save intact
+    temporary_path = f"{path}.tmp"
+    try:
+        with open(temporary_path, "wb") as file:
+            _ = file.write(
+                _HEADER.pack(
+                    MAGIC, FORMAT_VERSION, size, len(owned_runes), len(names), len(name_blob)
+                )
+            )
+            for name in _NODE_INT_FIELDS:
+                array: NDArray[np.int32] = getattr(store, name)
+                _write_section(file, array[:size].astype(_INT32).tobytes())
+            _write_section(file, depths.astype(_INT32).tobytes())
+            _write_section(file, store.rarity[:size].astype(_UINT8).tobytes())
+
+            _write_section(file, np.array([r.data.points for r in owned_runes], _INT32).tobytes())
+            _write_section(file, np.array([r.data.mult for r in owned_runes], _INT32).tobytes())
+            _write_section(file, np.array(rune_name_ids, _INT32).tobytes())
+            _write_section(file, np.array([r.rarity.value for r in owned_runes], _UINT8).tobytes())
+
+            _write_section(file, name_offsets.tobytes())
+            _write_section(file, name_blob)
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.unlink(temporary_path)
+        raise
+
+
+def save_context(path: str, ctx: Context) -> None:
+    save_game(path, node_store_of(ctx.node_tree), ctx.owned_runes)
+
+
+def load_game(path: str) -> SaveGame:
+    raw: NDArray[np.uint8] = np.memmap(path, dtype=_UINT8, mode="c")
+    if len(raw) < _HEADER.size:
+        raise SaveFormatError("truncated header")
+
+    magic, version, node_count, rune_count, name_count, blob_size = _HEADER.unpack(
+        raw[: _HEADER.size].tobytes()
+    )
+    if magic != MAGIC:
+        raise SaveFormatError("not a save file")
+    if version != FORMAT_VERSION:
+        raise SaveFormatError(f"unsupported save version {version}")
+
+    offset = _HEADER.size + -_HEADER.size % _ALIGNMENT
+
+    def take(dtype: np.dtype[np.generic], count: int) -> NDArray[np.generic]:
+        nonlocal offset
+        end = offset + count * dtype.itemsize
+        if end > len(raw):
+            raise SaveFormatError("truncated save file")
+        section = raw[offset:end].view(dtype)
+        offset = end + -end % _ALIGNMENT
+        return section
+
+    node_arrays = {name: take(_INT32, node_count) for name in _NODE_INT_FIELDS}
+    # Copied like the tree view's `nodes`, only the store may map the file
+    # so that `save_game` can release it
+    depths = np.array(take(_INT32, node_count))
+    rarity = take(_UINT8, node_count)
+    rune_points = take(_INT32, rune_count).tolist()
+    rune_mult = take(_INT32, rune_count).tolist()
+    rune_name_ids = take(_INT32, rune_count).tolist()
+    rune_rarity = take(_UINT8, rune_count).tolist()
+    name_offsets = take(_UINT32, name_count + 1).tolist()
+    name_blob = take(_UINT8, blob_size).tobytes()
+
+    names = [
+        name_blob[start:end].decode("utf-8")
+        for start, end in zip(name_offsets, name_offsets[1:])
+    ]
+    store = NodeStore(
+        size=node_count,
+        rarity=rarity,  # pyright:ignore[reportArgumentType]
+        version=np.zeros(node_count, dtype=np.int32),
+        names=names,
+        name_ids={name: i for i, name in enumerate(names)},
+        **node_arrays,  # pyright:ignore[reportArgumentType]
+    )
+    owned_runes = [
+        Rune(RuneRarity(rarity_value), RuneData(points, mult, names[name_id]))
+        for points, mult, name_id, rarity_value in zip(
+            rune_points, rune_mult, rune_name_ids, rune_rarity
+        )
+    ]
+    tree_view = StoreTreeView(
+        store,
+        np.arange(node_count, dtype=np.int32),
+        depths,  # pyright:ignore[reportArgumentType]
+    )
+    return SaveGame(store, owned_runes, tree_view)
+
+
+def load_into_context(ctx: Context, path: str) -> None:
+    """Swaps in a saved tree and inventory, along with its ready-made tree view."""
+    save = load_game(path)
+    ctx.node_tree = store_root(save.store)
+    ctx.owned_runes = save.owned_runes
+    ctx.state = NavigatingTree(selected_view_item_index=0)
+    ctx.viewport_top = 0
+    ctx.tree_version += 1
+    ctx.tree_view = TreeView(cast(list[TreeViewItem], save.tree_view), ctx.tree_version)
+    ctx.dirty = True
@@ -0,0 +1,134 @@
+from dataclasses import dataclass
+
+import numpy as np
+from numpy.typing import NDArray
+
+from branch_game.data_types import TreeViewItem
+from branch_game.node_store import view_depths, view_mult, view_points
+
+NO_PARENT = -1
+
+
+@dataclass
+class TreeScores:
+    """
+    Per-row scores aligned with a flattened (depth-first) tree view.
+    A node scores `mult * (points + sum of its children's scores)`, so a rune's
+    points are multiplied by every mult on its path to the root.
+    """
+
+    parents: NDArray[np.int64]
+    points: NDArray[np.int64]
+    mult: NDArray[np.int64]
+    subtree_points: NDArray[np.int64]
+    subtree_mult: NDArray[np.int64]
+    # Float, the mult products outgrow int64 on deep trees
+    score: NDArray[np.float64]
+    # `Context.tree_version` these scores were computed from
+    version: int = -1
+
+
+def parents_from_depths(depths: NDArray[np.int64]) -> NDArray[np.int64]:
+    """A depth-first row's parent is the closest preceding row one level up."""
+    parents = np.full(len(depths), NO_PARENT, dtype=np.int64)
+    levels = _split_levels(depths)
+
+    for upper, lower in zip(levels, levels[1:]):
+        parents[lower] = upper[np.searchsorted(upper, lower) - 1]
+    return parents
+
+
+def _split_levels(depths: NDArray[np.int64]) -> list[NDArray[np.int64]]:
+    """Row indices grouped by depth, ascending within each level."""
+    if len(depths) == 0:
+        return []
+    order = np.argsort(depths, kind="stable")
+    counts = np.bincount(depths)
+    return np.split(order, np.cumsum(counts)[:-1])
+
+
+def _accumulate(
+    parents: NDArray[np.int64],
+    levels: list[NDArray[np.int64]],
+    points: NDArray[np.int64],
+    mult: NDArray[np.int64],
+    version: int,
+) -> TreeScores:
+    """Bottom-up pass, vectorized over every node of a level at once."""
+    subtree_points = points.copy()
+    subtree_mult = mult.copy()
+    children_score = np.zeros(len(points), dtype=np.float64)
+    score = np.zeros(len(points), dtype=np.float64)
+
+    for level in reversed(levels):
+        score[level] = mult[level] * (points[level] + children_score[level])
+
+        level_parents = parents[level]
+        has_parent = level_parents != NO_PARENT
+        if not has_parent.any():
+            continue
+        rows, row_parents = level[has_parent], level_parents[has_parent]
+        np.add.at(children_score, row_parents, score[rows])
+        np.add.at(subtree_points, row_parents, subtree_points[rows])
+        np.add.at(subtree_mult, row_parents, subtree_mult[rows])
+
+    return TreeScores(parents, points, mult, subtree_points, subtree_mult, score, version)
+
+
+def score_tree_view(items: list[TreeViewItem], version: int = -1) -> TreeScores:
+    depths = view_depths(items)
+    points = view_points(items)
+    mult = view_mult(items)
+
+    # Relative to the first row, so a subtree's items can be scored on their own
+    if len(items):
+        depths -= depths[0]
+    parents = parents_from_depths(depths)
+    return _accumulate(parents, _split_levels(depths), points, mult, version)
+
+
+def patch_scores_after_insert(
+    scores: TreeScores, position: int, parent_position: int, new_items: list[TreeViewItem]
+) -> None:
+    """
+    Splices the scores of a subtree inserted at `position` under the row at
+    `parent_position`, then walks the ancestors to update their totals.
+    """
+    inserted = score_tree_view(new_items)
+    count = len(new_items)
+
+    scores.parents[scores.parents >= position] += count
+    inserted.parents[1:] += position
+    inserted.parents[0] = parent_position
+
+    scores.parents = np.insert(scores.parents, position, inserted.parents)
+    scores.points = np.insert(scores.points, position, inserted.points)
+    scores.mult = np.insert(scores.mult, position, inserted.mult)
+    scores.subtree_points = np.insert(scores.subtree_points, position, inserted.subtree_points)
+    scores.subtree_mult = np.insert(scores.subtree_mult, position, inserted.subtree_mult)
+    scores.score = np.insert(scores.score, position, inserted.score)
+
+    added_points = int(inserted.subtree_points[0])
+    added_mult = int(inserted.subtree_mult[0])
+    added_score = float(inserted.score[0])
+
+    ancestor = parent_position
+    while ancestor != NO_PARENT:
+        scores.subtree_points[ancestor] += added_points
+        scores.subtree_mult[ancestor] += added_mult
+        # Each ancestor scales the gain of everything below it by its own mult
+        added_score *= float(scores.mult[ancestor])
+        scores.score[ancestor] += added_score
+        ancestor = int(scores.parents[ancestor])
+
+
+def path_multipliers(scores: TreeScores, depths: NDArray[np.int64]) -> NDArray[np.float64]:
+    """Product of the mults from each row up to the root: what a point placed there is worth."""
+    products = scores.mult.astype(np.float64)
+    for level in _split_levels(depths)[1:]:
+        products[level] *= products[scores.parents[level]]
+    return products
+
+
+def tree_score(scores: TreeScores) -> float:
+    return float(scores.score[0]) if len(scores.score) else 0.0
@@ -1,11 +1,37 @@
 import sys
-from copy import deepcopy
 from dataclasses import dataclass, field
+from typing import Protocol
 
+import numpy as np
 from blessed import Terminal
+from numpy.typing import NDArray
+
+from branch_game.color_depth import snap_to_palette
+from branch_game.style_cache import EMPTY_STYLE_ID, StyleCache, intern_snapped_style
 
 # A cell is a tuple of (character, ANSI style string)
 ScreenCell = tuple[str, str]
+BLANK_CELL: ScreenCell = (" ", "")
+
+# Array backend cells pack the interned style ID into the high 32 bits
+# and the glyph codepoint into the low 32 bits of a single uint64
+GLYPH_MASK = 0xFFFF_FFFF
+STYLE_SHIFT = 32
+BLANK_GLYPH = ord(" ")
+# Never produced by `pack_cell`, used to force stale cells to differ
+INVALID_CELL = 0xFFFF_FFFF_FFFF_FFFF
+# `ScreenBuffer` counterpart of `INVALID_CELL`
+INVALID_SCREEN_CELL: ScreenCell = ("", "")
+# `CompositeScreenBuffer` counterpart of `INVALID_CELL`, not a valid codepoint
+INVALID_GLYPH = 0xFFFF_FFFF
+
+
+class OutputSink(Protocol):
+    """Where encoded frames are written, `sys.stdout` by default."""
+
+    def write(self, data: str, /) -> int: ...
+
+    def flush(self) -> None: ...
 
 
 @dataclass
@@ -13,6 +39,17 @@ class ScreenBuffer:
     width: int
     height: int
     cells: list[list[ScreenCell]]
+    # Shared template used to clear rows in place without allocating
+    blank_row: list[ScreenCell] = field(init=False, repr=False)
+    # Columns `dirty_start[y]:dirty_end[y]` of row y were written since the
+    # last clear, every other cell is blank
+    dirty_start: list[int] = field(init=False, repr=False)
+    dirty_end: list[int] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.blank_row = [BLANK_CELL] * self.width
+        self.dirty_start = [self.width] * self.height
+        self.dirty_end = [0] * self.height
 
 
 @dataclass
@@ -21,17 +58,216 @@ class Screen:
     height: int
     old_buffer: ScreenBuffer = field(init=False)
     new_buffer: ScreenBuffer = field(init=False)
+    styles: StyleCache = field(default_factory=StyleCache)
 
     def __post_init__(self):
         self.old_buffer = create_buffer(self.width, self.height)
         self.new_buffer = create_buffer(self.width, self.height)
 
 
+@dataclass
+class ArrayScreenBuffer:
+    width: int
+    height: int
+    cells: NDArray[np.uint64]
+    # Same meaning as on `ScreenBuffer`
+    dirty_start: NDArray[np.intp] = field(init=False, repr=False)
+    dirty_end: NDArray[np.intp] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.dirty_start = np.full(self.height, self.width, dtype=np.intp)
+        self.dirty_end = np.zeros(self.height, dtype=np.intp)
+
+
+@dataclass
+class ArrayScreen:
+    """NumPy-backed alternative to `Screen`, diffed with a single array comparison."""
+
+    width: int
+    height: int
+    old_buffer: ArrayScreenBuffer = field(init=False)
+    new_buffer: ArrayScreenBuffer = field(init=False)
+    styles: StyleCache = field(default_factory=StyleCache)
+
+    def __post_init__(self):
+        self.old_buffer = create_array_buffer(self.width, self.height)
+        self.new_buffer = create_array_buffer(self.width, self.height)
+
+
+@dataclass
+class CompositeScreenBuffer:
+    width: int
+    height: int
+    glyphs: NDArray[np.uint32]
+    bold: NDArray[np.bool_]
+    # Linear 0..1 RGB planes of shape (height, width, 3), blended in place by layers
+    fg: NDArray[np.float32]
+    bg: NDArray[np.float32]
+    # 0xRRGGBB of `fg`/`bg` as of the last diff, snapped to the color depth's palette
+    fg_quantized: NDArray[np.uint32]
+    bg_quantized: NDArray[np.uint32]
+    # Same meaning as on `ScreenBuffer`
+    dirty_start: NDArray[np.intp] = field(init=False, repr=False)
+    dirty_end: NDArray[np.intp] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.dirty_start = np.full(self.height, self.width, dtype=np.intp)
+        self.dirty_end = np.zeros(self.height, dtype=np.intp)
+
+
+@dataclass
+class CompositeScreen:
+    """
+    Keeps colors as float RGB planes so translucent layers blend over what is
+    already drawn. Colors are quantized and styled once per changed cell, at diff time.
+    """
+
+    width: int
+    height: int
+    # Builds the escapes of quantized colors while diffing
+    terminal: Terminal
+    old_buffer: CompositeScreenBuffer = field(init=False)
+    new_buffer: CompositeScreenBuffer = field(init=False)
+    styles: StyleCache = field(default_factory=StyleCache)
+
+    def __post_init__(self):
+        self.old_buffer = create_composite_buffer(self.width, self.height)
+        self.new_buffer = create_composite_buffer(self.width, self.height)
+
+
+type AnyScreen = Screen | ArrayScreen | CompositeScreen
+type AnyScreenBuffer = ScreenBuffer | ArrayScreenBuffer | CompositeScreenBuffer
+
+
+@dataclass
+class CellRun:
+    """Pre-styled cells for `blit_at`, in the form the screen backend stores them."""
+
+    # `CompositeScreen` runs are structured arrays of `compositor.CELL_DTYPE`
+    cells: list[ScreenCell] | NDArray[np.uint64] | NDArray[np.void]
+
+
 def create_buffer(width: int, height: int) -> ScreenBuffer:
-    cells = [[(" ", "") for _ in range(width)] for _ in range(height)]
+    cells = [[BLANK_CELL] * width for _ in range(height)]
     return ScreenBuffer(width=width, height=height, cells=cells)
 
 
+def create_array_buffer(width: int, height: int) -> ArrayScreenBuffer:
+    cells = np.full((height, width), pack_cell(BLANK_GLYPH, EMPTY_STYLE_ID), dtype=np.uint64)
+    return ArrayScreenBuffer(width=width, height=height, cells=cells)
+
+
+def create_composite_buffer(width: int, height: int) -> CompositeScreenBuffer:
+    return CompositeScreenBuffer(
+        width=width,
+        height=height,
+        glyphs=np.full((height, width), BLANK_GLYPH, dtype=np.uint32),
+        bold=np.zeros((height, width), dtype=np.bool_),
+        fg=np.zeros((height, width, 3), dtype=np.float32),
+        bg=np.zeros((height, width, 3), dtype=np.float32),
+        fg_quantized=np.zeros((height, width), dtype=np.uint32),
+        bg_quantized=np.zeros((height, width), dtype=np.uint32),
+    )
+
+
+def clear_buffer(buffer: ScreenBuffer) -> None:
+    """Blanks the cells written since the last clear."""
+    blank_row = buffer.blank_row
+    dirty_start, dirty_end = buffer.dirty_start, buffer.dirty_end
+
+    for y, row in enumerate(buffer.cells):
+        start, end = dirty_start[y], dirty_end[y]
+        if start < end:
+            row[start:end] = blank_row[start:end]
+            dirty_start[y] = buffer.width
+            dirty_end[y] = 0
+
+
+def clear_array_buffer(buffer: ArrayScreenBuffer) -> None:
+    rows = np.flatnonzero(buffer.dirty_start < buffer.dirty_end)
+    if len(rows):
+        start = int(buffer.dirty_start[rows].min())
+        end = int(buffer.dirty_end[rows].max())
+        buffer.cells[rows, start:end] = pack_cell(BLANK_GLYPH, EMPTY_STYLE_ID)
+
+    buffer.dirty_start.fill(buffer.width)
+    buffer.dirty_end.fill(0)
+
+
+def clear_composite_buffer(buffer: CompositeScreenBuffer) -> None:
+    rows = np.flatnonzero(buffer.dirty_start < buffer.dirty_end)
+    if len(rows):
+        start = int(buffer.dirty_start[rows].min())
+        end = int(buffer.dirty_end[rows].max())
+        buffer.glyphs[rows, start:end] = BLANK_GLYPH
+        buffer.bold[rows, start:end] = False
+        buffer.fg[rows, start:end] = 0.0
+        buffer.bg[rows, start:end] = 0.0
+        buffer.fg_quantized[rows, start:end] = 0
+        buffer.bg_quantized[rows, start:end] = 0
+
+    buffer.dirty_start.fill(buffer.width)
+    buffer.dirty_end.fill(0)
+
+
+def mark_dirty(buffer: AnyScreenBuffer, y: int, start: int, end: int) -> None:
+    """Records a write to columns `start:end` of row `y`, so the next diff looks at them."""
+    if start >= end:
+        return
+    if start < buffer.dirty_start[y]:
+        buffer.dirty_start[y] = start
+    if end > buffer.dirty_end[y]:
+        buffer.dirty_end[y] = end
+
+
+def mark_all_dirty(buffer: AnyScreenBuffer) -> None:
+    for y in range(buffer.height):
+        buffer.dirty_start[y] = 0
+        buffer.dirty_end[y] = buffer.width
+
+
+def invalidate_buffer(buffer: AnyScreenBuffer) -> None:
+    """Makes every cell differ from anything drawn, so the next diff repaints the whole screen."""
+    if isinstance(buffer, ArrayScreenBuffer):
+        buffer.cells.fill(INVALID_CELL)
+    elif isinstance(buffer, CompositeScreenBuffer):
+        buffer.glyphs.fill(INVALID_GLYPH)
+    else:
+        for row in buffer.cells:
+            row[:] = [INVALID_SCREEN_CELL] * buffer.width
+    mark_all_dirty(buffer)
+
+
+def resize_screen(screen: AnyScreen, width: int, height: int) -> None:
+    """
+    Reallocates both buffers at the new size, between frames, so nothing drawn
+    is lost. The terminal reflowed what it showed, so the displayed frame is
+    invalidated and the next diff repaints everything.
+    """
+    if isinstance(screen, ArrayScreen):
+        screen.old_buffer = create_array_buffer(width, height)
+        screen.new_buffer = create_array_buffer(width, height)
+    elif isinstance(screen, CompositeScreen):
+        screen.old_buffer = create_composite_buffer(width, height)
+        screen.new_buffer = create_composite_buffer(width, height)
+    else:
+        screen.old_buffer = create_buffer(width, height)
+        screen.new_buffer = create_buffer(width, height)
+
+    invalidate_buffer(screen.old_buffer)
+    screen.width, screen.height = width, height
+
+
+def pack_cell(glyph: int, style_id: int) -> int:
+    return (style_id << STYLE_SHIFT) | glyph
+
+
+def quantize_rgb(plane: NDArray[np.float32]) -> NDArray[np.uint32]:
+    """Packs a (..., 3) plane of 0..1 colors into 0xRRGGBB integers."""
+    channels = np.clip(np.rint(plane * 255.0), 0, 255).astype(np.uint32)
+    return (channels[..., 0] << 16) | (channels[..., 1] << 8) | channels[..., 2]
+
+
 def draw_to_buffer(buffer: ScreenBuffer) -> None:
     """Example frame drawing logic."""
     width, height = buffer.width, buffer.height
@@ -48,6 +284,8 @@ def draw_to_buffer(buffer: ScreenBuffer) -> None:
     cells[height - 1][0] = ("└", "")
     cells[height - 1][width - 1] = ("┘", "")
 
+    mark_all_dirty(buffer)
+
     label = "Hello, Screen Buffer!"
     x_start = max((width - len(label)) // 2, 1)
     y = height // 2
@@ -55,25 +293,153 @@ def draw_to_buffer(buffer: ScreenBuffer) -> None:
         if 0 <= x_start + i < width:
             cells[y][x_start + i] = (char, "")
 
-def buffer_diff(screen: Screen) -> list[tuple[int, int, ScreenCell]]:
+
+def buffer_diff(screen: AnyScreen) -> list[tuple[int, int, ScreenCell]]:
+    if isinstance(screen, ArrayScreen):
+        return _array_buffer_diff(screen)
+    if isinstance(screen, CompositeScreen):
+        return _composite_buffer_diff(screen)
+
     old: ScreenBuffer = screen.old_buffer
     new: ScreenBuffer = screen.new_buffer
 
+    # Outside of what either frame wrote, both hold blank cells
     diffs: list[tuple[int, int, ScreenCell]] = []
     for y in range(new.height):
-        for x in range(new.width):
-            if old.cells[y][x] != new.cells[y][x]:
-                diffs.append((y, x, new.cells[y][x]))
+        start = min(old.dirty_start[y], new.dirty_start[y])
+        end = max(old.dirty_end[y], new.dirty_end[y])
+        old_row, new_row = old.cells[y], new.cells[y]
+        for x in range(start, end):
+            if old_row[x] != new_row[x]:
+                diffs.append((y, x, new_row[x]))
 
-    screen.old_buffer = deepcopy(new)  # full frame copy
-    screen.new_buffer = create_buffer(screen.width, screen.height)
+    # Swap roles by reference; the stale frame is cleared in place for reuse
+    screen.old_buffer, screen.new_buffer = new, old
+    clear_buffer(old)
 
     return diffs
 
 
-def flush_diffs(term: Terminal, diffs: list[tuple[int, int, ScreenCell]]) -> None:
+def _array_buffer_diff(screen: ArrayScreen) -> list[tuple[int, int, ScreenCell]]:
+    old: ArrayScreenBuffer = screen.old_buffer
+    new: ArrayScreenBuffer = screen.new_buffer
+
+    # Style IDs recycled by the cache no longer mean what the old frame drew
+    if screen.styles.recycled_ids:
+        recycled = np.fromiter(screen.styles.recycled_ids, dtype=np.uint64)
+        old.cells[np.isin(old.cells >> np.uint64(STYLE_SHIFT), recycled)] = INVALID_CELL
+        screen.styles.recycled_ids.clear()
+
+    # Compare the bounding box of what either frame wrote, everything else is blank in both
+    starts = np.minimum(old.dirty_start, new.dirty_start)
+    ends = np.maximum(old.dirty_end, new.dirty_end)
+    rows = np.flatnonzero(starts < ends)
+
+    if len(rows):
+        start, end = int(starts[rows].min()), int(ends[rows].max())
+        changed = old.cells[rows, start:end] != new.cells[rows, start:end]
+        changed_rows, changed_cols = np.nonzero(changed)
+        ys, xs = rows[changed_rows], changed_cols + start
+    else:
+        ys = xs = np.empty(0, dtype=np.intp)
+    packed: list[int] = new.cells[ys, xs].tolist()
+    escapes = screen.styles.escapes
+
+    diffs: list[tuple[int, int, ScreenCell]] = [
+        (y, x, (chr(cell & GLYPH_MASK), escapes[cell >> STYLE_SHIFT]))
+        for y, x, cell in zip(ys.tolist(), xs.tolist(), packed)
+    ]
+
+    screen.old_buffer, screen.new_buffer = new, old
+    clear_array_buffer(old)
+
+    return diffs
+
+
+def _composite_buffer_diff(screen: CompositeScreen) -> list[tuple[int, int, ScreenCell]]:
+    old: CompositeScreenBuffer = screen.old_buffer
+    new: CompositeScreenBuffer = screen.new_buffer
+
+    starts = np.minimum(old.dirty_start, new.dirty_start)
+    ends = np.maximum(old.dirty_end, new.dirty_end)
+    rows = np.flatnonzero(starts < ends)
+
+    if len(rows):
+        start, end = int(starts[rows].min()), int(ends[rows].max())
+        # Quantized once per frame for the whole box, not per drawn segment
+        depth = screen.styles.color_depth
+        fg_quantized = snap_to_palette(depth, quantize_rgb(new.fg[rows, start:end]))
+        bg_quantized = snap_to_palette(depth, quantize_rgb(new.bg[rows, start:end]))
+        new.fg_quantized[rows, start:end] = fg_quantized
+        new.bg_quantized[rows, start:end] = bg_quantized
+
+        changed = (
+            (old.glyphs[rows, start:end] != new.glyphs[rows, start:end])
+            | (old.bold[rows, start:end] != new.bold[rows, start:end])
+            | (old.fg_quantized[rows, start:end] != fg_quantized)
+            | (old.bg_quantized[rows, start:end] != bg_quantized)
+        )
+        changed_rows, changed_cols = np.nonzero(changed)
+        ys, xs = rows[changed_rows], changed_cols + start
+    else:
+        ys = xs = np.empty(0, dtype=np.intp)
+
+    glyphs: list[int] = new.glyphs[ys, xs].tolist()
+    bolds: list[bool] = new.bold[ys, xs].tolist()
+    fgs: list[int] = new.fg_quantized[ys, xs].tolist()
+    bgs: list[int] = new.bg_quantized[ys, xs].tolist()
+
+    # Escapes are looked up by packed color, each distinct one is built once per frame
+    terminal, styles = screen.terminal, screen.styles
+    frame_escapes: dict[tuple[int, int, bool], str] = {}
+    diffs: list[tuple[int, int, ScreenCell]] = []
+    for y, x, glyph, bold, fg, bg in zip(ys.tolist(), xs.tolist(), glyphs, bolds, fgs, bgs):
+        escape = frame_escapes.get((fg, bg, bold))
+        if escape is None:
+            fg_rgb = (fg >> 16, (fg >> 8) & 0xFF, fg & 0xFF)
+            bg_rgb = (bg >> 16, (bg >> 8) & 0xFF, bg & 0xFF)
+            escape = styles.escapes[intern_snapped_style(terminal, styles, fg_rgb, bg_rgb, bold)]
+            frame_escapes[fg, bg, bold] = escape
+        diffs.append((y, x, (chr(glyph), escape)))
+
+    # Cells never hold style IDs, so there is nothing for recycled ones to invalidate
+    styles.recycled_ids.clear()
+
+    screen.old_buffer, screen.new_buffer = new, old
+    clear_composite_buffer(old)
+
+    return diffs
+
+
+def encode_diffs(term: Terminal, diffs: list[tuple[int, int, ScreenCell]]) -> str:
+    """
+    Encodes row-major diffs into one output string.
+    Adjacent dirty cells on a row share a single cursor move, and a style
+    sequence is only emitted when it differs from the previous cell's.
+    """
     output: list[str] = []
+    cursor_y, cursor_x = -1, -1
+    current_style: str | None = None
+
     for y, x, (char, style) in diffs:
-        output.append(term.move(y, x) + style + char)
-    _ = sys.stdout.write("".join(output))
-    _ = sys.stdout.flush()
+        if y != cursor_y or x != cursor_x:
+            output.append(term.move(y, x))
+        if style != current_style:
+            output.append(style)
+            current_style = style
+        output.append(char)
+        # Writing a cell leaves the cursor right after it
+        cursor_y, cursor_x = y, x + 1
+
+    return "".join(output)
+
+
+def flush_diffs(
+    term: Terminal, diffs: list[tuple[int, int, ScreenCell]], out: OutputSink | None = None
+) -> int:
+    """Writes the encoded diffs to `out` (stdout by default) and returns the bytes written."""
+    sink: OutputSink = out if out is not None else sys.stdout
+    data = encode_diffs(term, diffs)
+    _ = sink.write(data)
+    sink.flush()
+    return len(data) if data.isascii() else len(data.encode("utf-8"))
@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from collections.abc import Hashable
+from dataclasses import dataclass, field
+
+from blessed import Terminal
+
+from branch_game.color_depth import ColorDepth, palette_style, snap_rgb
+
+# ID 0 is reserved for the empty style and is never evicted
+EMPTY_STYLE_ID = 0
+
+
+@dataclass
+class StyleCache:
+    """
+    Bounded LRU that interns ANSI style strings under small integer IDs.
+    Evicted IDs are recycled, so `capacity` must exceed the number of
+    distinct styles visible across two consecutive frames.
+    """
+
+    capacity: int = 1024
+    # Colors are snapped to this mode's palette before being interned
+    color_depth: ColorDepth = ColorDepth.TRUECOLOR
+    escapes: list[str] = field(default_factory=lambda: [""])
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    # IDs reassigned since the last diff; cells still holding them are stale
+    recycled_ids: set[int] = field(default_factory=set)  # type: ignore[reportUnknownVariableType]
+    _ids: OrderedDict[Hashable, int] = field(default_factory=OrderedDict, repr=False)
+
+
+def lookup_style(cache: StyleCache, key: Hashable) -> int | None:
+    style_id = cache._ids.get(key)  # pyright:ignore[reportPrivateUsage]
+    if style_id is None:
+        cache.misses += 1
+        return None
+
+    cache._ids.move_to_end(key)  # pyright:ignore[reportPrivateUsage]
+    cache.hits += 1
+    return style_id
+
+
+def store_style(cache: StyleCache, key: Hashable, escape: str) -> int:
+    ids = cache._ids  # pyright:ignore[reportPrivateUsage]
+
+    if len(ids) < cache.capacity:
+        style_id = len(cache.escapes)
+        cache.escapes.append(escape)
+    else:
+        _, style_id = ids.popitem(last=False)
+        cache.escapes[style_id] = escape
+        cache.evictions += 1
+        cache.recycled_ids.add(style_id)
+
+    ids[key] = style_id
+    return style_id
+
+
+def make_style(
+    term: Terminal, fg_rgb: tuple[int, int, int], bg_rgb: tuple[int, int, int], bold: bool
+) -> str:
+    if not term.does_styling:
+        return term.normal
+
+    fg_str = term.color_rgb(*fg_rgb)
+    maybe_bold_str: str = term.bold if bold else ""
+    style: str = term.normal + maybe_bold_str + fg_str + term.on_color_rgb(*bg_rgb)
+    return style
+
+
+def intern_rgb_style(
+    term: Terminal,
+    cache: StyleCache,
+    fg_rgb: tuple[int, int, int],
+    bg_rgb: tuple[int, int, int],
+    bold: bool,
+) -> int:
+    """Returns the style ID for quantized colors, building its escape on a miss."""
+    # Colors sharing a palette entry share one style
+    depth = cache.color_depth
+    return intern_snapped_style(
+        term, cache, snap_rgb(depth, fg_rgb), snap_rgb(depth, bg_rgb), bold
+    )
+
+
+def intern_snapped_style(
+    term: Terminal,
+    cache: StyleCache,
+    fg_rgb: tuple[int, int, int],
+    bg_rgb: tuple[int, int, int],
+    bold: bool,
+) -> int:
+    """`intern_rgb_style` for colors already snapped to the cache's color depth."""
+    key = (fg_rgb, bg_rgb, bold)
+    style_id = lookup_style(cache, key)
+    if style_id is None:
+        depth = cache.color_depth
+        if depth == ColorDepth.TRUECOLOR or not term.does_styling:
+            escape = make_style(term, fg_rgb, bg_rgb, bold)
+        else:
+            escape = palette_style(term, depth, fg_rgb, bg_rgb, bold)
+        style_id = store_style(cache, key, escape)
+    return style_id
+
+
+def style_cache_hit_rate(cache: StyleCache) -> float:
+    lookups = cache.hits + cache.misses
+    return cache.hits / lookups if lookups else 0.0
@@ -0,0 +1,85 @@
+from branch_game.data_types import Context, Node, TreeViewItem
+from branch_game.helpers import insert_child
+from branch_game.node_store import flatten_store_tree
+from branch_game.scoring import TreeScores, patch_scores_after_insert, score_tree_view
+
+
+def flatten_subtree(node: Node, depth: int = 0) -> list[TreeViewItem]:
+    """Depth-first flattening of `node` and its descendants, without recursion."""
+    out: list[TreeViewItem] = []
+    stack: list[tuple[Node, int]] = [(node, depth)]
+
+    while stack:
+        current, current_depth = stack.pop()
+        out.append(TreeViewItem(current, current_depth))
+        # Reversed so the first child is popped (and emitted) first
+        for child in reversed(current.children):
+            stack.append((child, current_depth + 1))
+
+    return out
+
+
+def generate_tree_view(ctx: Context) -> list[TreeViewItem]:
+    items = flatten_store_tree(ctx.node_tree)
+    return items if items is not None else flatten_subtree(ctx.node_tree)
+
+
+def get_tree_view(ctx: Context) -> list[TreeViewItem]:
+    """Returns the cached tree view, only walking the tree when `tree_version` moved."""
+    view = ctx.tree_view
+    if view.version != ctx.tree_version:
+        view.items = generate_tree_view(ctx)
+        view.version = ctx.tree_version
+    return view.items
+
+
+def get_tree_scores(ctx: Context) -> TreeScores:
+    """Returns scores aligned with `get_tree_view`, rescoring only when `tree_version` moved."""
+    scores = ctx.tree_scores
+    if scores is None or scores.version != ctx.tree_version:
+        scores = score_tree_view(get_tree_view(ctx), ctx.tree_version)
+        ctx.tree_scores = scores
+    return scores
+
+
+def insert_child_in_view(ctx: Context, parent_view_index: int, index: int, child: Node) -> None:
+    """
+    Inserts `child` at `index` under the node at `parent_view_index`,
+    splicing only the child's subtree into the cached tree view and scores.
+    """
+    items = get_tree_view(ctx)
+    parent_item = items[parent_view_index]
+    child_depth = parent_item.depth + 1
+
+    # Skip over the subtrees of the `index` siblings preceding the insertion point
+    position = parent_view_index + 1
+    siblings_seen = 0
+    while position < len(items) and items[position].depth >= child_depth:
+        if items[position].depth == child_depth:
+            if siblings_seen == index:
+                break
+            siblings_seen += 1
+        position += 1
+
+    insert_child(parent_item.node, index, child)
+    new_items = flatten_subtree(child, child_depth)
+    items[position:position] = new_items
+
+    scores = ctx.tree_scores
+    scores_are_current = scores is not None and scores.version == ctx.tree_version
+
+    ctx.tree_version += 1
+    ctx.tree_view.version = ctx.tree_version
+
+    if scores is not None and scores_are_current:
+        patch_scores_after_insert(scores, position, parent_view_index, new_items)
+        scores.version = ctx.tree_version
+
+
+def scroll_into_view(viewport_top: int, focused_index: int, viewport_height: int) -> int:
+    """Returns the smallest scroll change that keeps `focused_index` inside the viewport."""
+    if focused_index < viewport_top:
+        return focused_index
+    if focused_index >= viewport_top + viewport_height:
+        return focused_index - viewport_height + 1
+    return viewport_top